@@ -26,6 +26,15 @@ public class CashPaymentController : ControllerBase
     private static readonly Dictionary<string, CashPaymentSession> _activeSessions = new();
     private static readonly object _sessionLock = new();
 
+    // Bumped whenever the active session list changes; used as the ETag and long-poll cursor for
+    // active-sessions polls. The per-process prefix keeps values from a previous run from matching.
+    private static readonly string _sessionsEtagPrefix = Guid.NewGuid().ToString("N")[..8];
+    private static long _sessionsVersion;
+    private static TaskCompletionSource _sessionsChanged = new(TaskCreationOptions.RunContinuationsAsynchronously);
+
+    // Upper bound for how long an active-sessions long-poll is held open
+    private const int MaxLongPollSeconds = 30;
+
     public CashPaymentController(
         IHubContext<OrderHub> orderHub,
         IOrderRepository orderRepository,
@@ -42,6 +51,19 @@ public class CashPaymentController : ControllerBase
         _configuration = configuration;
     }
 
+    private static string SessionsCursor => $"{_sessionsEtagPrefix}-{_sessionsVersion}";
+
+    /// <summary>
+    /// Record a change to the active session list and wake any waiting long-polls
+    /// Must be called while holding _sessionLock
+    /// </summary>
+    private static void MarkSessionsChanged()
+    {
+        _sessionsVersion++;
+        _sessionsChanged.TrySetResult();
+        _sessionsChanged = new TaskCompletionSource(TaskCreationOptions.RunContinuationsAsynchronously);
+    }
+
     /// <summary>
     /// Validate API key from request header (optional security for production)
     /// </summary>
@@ -97,6 +119,7 @@ public class CashPaymentController : ControllerBase
                 };
 
                 _activeSessions[request.OrderNumber] = session;
+                MarkSessionsChanged();
                 _logger.LogInformation("Cash payment session initialized for order: {OrderNumber}, Amount: {TotalAmount}", 
                     request.OrderNumber, request.TotalAmount);
 
@@ -150,6 +173,7 @@ public class CashPaymentController : ControllerBase
                 // Update the amount inserted
                 session.AmountInserted += request.AmountAdded;
                 session.LastUpdateAt = DateTime.UtcNow;
+                MarkSessionsChanged();
 
                 _logger.LogInformation("Cash amount updated for order {OrderNumber}: Added={AmountAdded}, Total={AmountInserted}/{TotalRequired}",
                     request.OrderNumber, request.AmountAdded, session.AmountInserted, session.TotalRequired);
@@ -181,14 +205,47 @@ public class CashPaymentController : ControllerBase
     /// <summary>
     /// Get all active cash payment sessions (for Raspberry Pi to poll)
     /// Returns list of orders waiting for cash payment
+    /// Responds 304 Not Modified when the If-None-Match header matches the current ETag
+    /// Long-poll: with ?wait=N&amp;since=cursor the request is held for up to N seconds
+    /// (capped at MaxLongPollSeconds) until the session list moves past that cursor
     /// </summary>
     [HttpGet("active-sessions")]
-    public IActionResult GetActiveSessions()
+    public async Task<IActionResult> GetActiveSessions([FromQuery] int wait = 0, [FromQuery] string? since = null)
     {
         try
         {
+            if (wait > 0 && since != null)
+            {
+                Task changed;
+                lock (_sessionLock)
+                {
+                    changed = since == SessionsCursor ? _sessionsChanged.Task : Task.CompletedTask;
+                }
+
+                if (!changed.IsCompleted)
+                {
+                    try
+                    {
+                        await changed.WaitAsync(TimeSpan.FromSeconds(Math.Min(wait, MaxLongPollSeconds)), HttpContext.RequestAborted);
+                    }
+                    catch (TimeoutException)
+                    {
+                        // Nothing changed; fall through and return the current (unchanged) list
+                    }
+                }
+            }
+
             lock (_sessionLock)
             {
+                var cursor = SessionsCursor;
+                var etag = $"W/\"{cursor}\"";
+                Response.Headers.ETag = etag;
+
+                if (Request.Headers.IfNoneMatch.Contains(etag))
+                {
+                    return StatusCode(StatusCodes.Status304NotModified);
+                }
+
                 var activeSessions = _activeSessions.Values
                     .Where(s => s.Status == PaymentSessionStatus.Active)
                     .Select(s => new
@@ -205,10 +262,16 @@ public class CashPaymentController : ControllerBase
                 {
                     success = true,
                     count = activeSessions.Count,
+                    cursor,
                     sessions = activeSessions
                 });
             }
         }
+        catch (OperationCanceledException) when (HttpContext.RequestAborted.IsCancellationRequested)
+        {
+            // Client went away while long-polling
+            return new EmptyResult();
+        }
         catch (Exception ex)
         {
             _logger.LogError(ex, "Error getting active payment sessions");
@@ -273,6 +336,7 @@ public class CashPaymentController : ControllerBase
                 amountToReturn = session.AmountInserted;
                 session.Status = PaymentSessionStatus.Cancelled;
                 session.CompletedAt = DateTime.UtcNow;
+                MarkSessionsChanged();
 
                 _logger.LogInformation("Cash payment cancelled for order {OrderNumber}, Returning: {AmountToReturn}",
                     orderNumber, amountToReturn);
@@ -335,6 +399,7 @@ public class CashPaymentController : ControllerBase
                 change = Math.Max(0, session.AmountInserted - session.TotalRequired);
                 session.Status = PaymentSessionStatus.Completed;
                 session.CompletedAt = DateTime.UtcNow;
+                MarkSessionsChanged();
 
                 _logger.LogInformation("Cash payment completed for order {OrderNumber}: Paid={AmountPaid}, Change={Change}",
                     orderNumber, amountPaid, change);
@@ -14,6 +14,12 @@ public class ReceiptQueueController : ControllerBase
     private readonly IPrintQueueService _printQueueService;
     private readonly ILogger<ReceiptQueueController> _logger;
 
+    // Upper bound for how long a next-job long-poll is held open
+    private const int MaxLongPollSeconds = 30;
+
+    // Upper bound for how many jobs one next-job call may hand out
+    private const int MaxBatchJobs = 10;
+
     public ReceiptQueueController(
         IPrintQueueService printQueueService,
         ILogger<ReceiptQueueController> logger)
@@ -24,28 +30,56 @@ public class ReceiptQueueController : ControllerBase
 
     /// <summary>
     /// Get next pending print job (called by Raspberry Pi)
+    /// Long-poll: with ?wait=N an empty queue holds the request for up to N seconds
+    /// (capped at MaxLongPollSeconds) and answers as soon as a job is queued
+    /// Batch: with ?max=N up to N already-queued jobs (capped at MaxBatchJobs) are returned
+    /// in "jobs"; the first job is also returned in the top-level fields
+    /// Ack: ?ack=id1,id2 marks the caller's previously printed jobs as completed first,
+    /// saving a separate complete call per job
     /// </summary>
     [HttpGet("next")]
-    public async Task<IActionResult> GetNextPrintJob()
+    public async Task<IActionResult> GetNextPrintJob([FromQuery] int wait = 0, [FromQuery] int max = 1, [FromQuery] string? ack = null)
     {
         try
         {
-            var printJob = await _printQueueService.GetNextPrintJobAsync();
+            if (!string.IsNullOrEmpty(ack))
+            {
+                foreach (var jobId in ack.Split(',', StringSplitOptions.RemoveEmptyEntries | StringSplitOptions.TrimEntries))
+                {
+                    await _printQueueService.MarkJobCompletedAsync(jobId);
+                }
+            }
             
-            if (printJob == null)
+            var printJobs = await _printQueueService.GetNextPrintJobsAsync(
+                Math.Clamp(max, 1, MaxBatchJobs),
+                TimeSpan.FromSeconds(Math.Clamp(wait, 0, MaxLongPollSeconds)), HttpContext.RequestAborted);
+            
+            if (printJobs.Count == 0)
             {
                 // No jobs pending - return 204 No Content
                 return NoContent();
             }
             
+            var printJob = printJobs[0];
             return Ok(new
             {
                 hasPrintJob = true,
                 jobId = printJob.JobId,
                 receipt = printJob.Receipt,
-                queuedAt = printJob.QueuedAt
+                queuedAt = printJob.QueuedAt,
+                jobs = printJobs.Select(j => new
+                {
+                    jobId = j.JobId,
+                    receipt = j.Receipt,
+                    queuedAt = j.QueuedAt
+                })
             });
         }
+        catch (OperationCanceledException) when (HttpContext.RequestAborted.IsCancellationRequested)
+        {
+            // Pi disconnected while waiting; nothing was dequeued
+            return NoContent();
+        }
         catch (Exception ex)
         {
             _logger.LogError(ex, "Error getting next print job");
@@ -129,4 +163,3 @@ public class FailJobRequest
 {
     public string? Error { get; set; }
 }
-
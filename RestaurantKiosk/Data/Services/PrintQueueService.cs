@@ -1,4 +1,5 @@
 using System.Collections.Concurrent;
+using System.Diagnostics.CodeAnalysis;
 using RestaurantKiosk.Data.Entities;
 
 namespace RestaurantKiosk.Data.Services;
@@ -15,8 +16,15 @@ public interface IPrintQueueService
     
     /// <summary>
     /// Get the next pending print job
+    /// If the queue is empty, waits up to <paramref name="wait"/> for a job to be queued
     /// </summary>
-    Task<PrintJob?> GetNextPrintJobAsync();
+    Task<PrintJob?> GetNextPrintJobAsync(TimeSpan wait = default, CancellationToken cancellationToken = default);
+    
+    /// <summary>
+    /// Get up to <paramref name="maxJobs"/> pending print jobs
+    /// Waits like <see cref="GetNextPrintJobAsync"/> for the first job; the rest are only taken if already queued
+    /// </summary>
+    Task<IReadOnlyList<PrintJob>> GetNextPrintJobsAsync(int maxJobs, TimeSpan wait = default, CancellationToken cancellationToken = default);
     
     /// <summary>
     /// Mark a print job as completed
@@ -42,6 +50,11 @@ public class PrintQueueService : IPrintQueueService
     private static readonly ConcurrentQueue<PrintJob> _printQueue = new();
     private static readonly ConcurrentDictionary<string, PrintJob> _allJobs = new();
 
+    // Released once per queued job; long-polling GetNextPrintJobAsync calls wait on it.
+    // The count may run ahead of the queue (jobs taken without waiting), which only
+    // costs a waiter an extra empty TryDequeue.
+    private static readonly SemaphoreSlim _jobsAvailable = new(0);
+
     public PrintQueueService(ILogger<PrintQueueService> logger)
     {
         _logger = logger;
@@ -61,6 +74,7 @@ public class PrintQueueService : IPrintQueueService
         
         _printQueue.Enqueue(printJob);
         _allJobs[jobId] = printJob;
+        _jobsAvailable.Release();
         
         _logger.LogInformation("Queued print job {JobId} for order {OrderNumber}", 
             jobId, receiptData.OrderNumber);
@@ -68,20 +82,61 @@ public class PrintQueueService : IPrintQueueService
         return Task.FromResult(jobId);
     }
 
-    public Task<PrintJob?> GetNextPrintJobAsync()
+    public async Task<PrintJob?> GetNextPrintJobAsync(TimeSpan wait = default, CancellationToken cancellationToken = default)
     {
-        if (_printQueue.TryDequeue(out var job))
+        var deadline = DateTime.UtcNow + wait;
+        
+        while (true)
         {
-            job.Status = PrintJobStatus.Printing;
-            job.PrintStartedAt = DateTime.UtcNow;
-            
-            _logger.LogInformation("Dequeued print job {JobId} for order {OrderNumber}", 
-                job.JobId, job.Receipt.OrderNumber);
+            if (TryTakeJob(out var job))
+            {
+                return job;
+            }
             
-            return Task.FromResult<PrintJob?>(job);
+            var remaining = deadline - DateTime.UtcNow;
+            if (remaining <= TimeSpan.Zero || !await _jobsAvailable.WaitAsync(remaining, cancellationToken))
+            {
+                return null;
+            }
+        }
+    }
+
+    public async Task<IReadOnlyList<PrintJob>> GetNextPrintJobsAsync(int maxJobs, TimeSpan wait = default, CancellationToken cancellationToken = default)
+    {
+        var jobs = new List<PrintJob>();
+        
+        var first = await GetNextPrintJobAsync(wait, cancellationToken);
+        if (first == null)
+        {
+            return jobs;
         }
         
-        return Task.FromResult<PrintJob?>(null);
+        jobs.Add(first);
+        while (jobs.Count < maxJobs && TryTakeJob(out var job))
+        {
+            jobs.Add(job);
+        }
+        
+        return jobs;
+    }
+
+    /// <summary>
+    /// Dequeue a pending job, if any, and mark it as printing
+    /// </summary>
+    private bool TryTakeJob([NotNullWhen(true)] out PrintJob? job)
+    {
+        if (!_printQueue.TryDequeue(out job))
+        {
+            return false;
+        }
+        
+        job.Status = PrintJobStatus.Printing;
+        job.PrintStartedAt = DateTime.UtcNow;
+        
+        _logger.LogInformation("Dequeued print job {JobId} for order {OrderNumber}", 
+            job.JobId, job.Receipt.OrderNumber);
+        
+        return true;
     }
 
     public Task MarkJobCompletedAsync(string jobId)
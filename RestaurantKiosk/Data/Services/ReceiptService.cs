@@ -19,6 +19,7 @@ public class ReceiptService : IReceiptService
     private readonly string _restaurantPhone;
     private readonly string _restaurantEmail;
     private readonly bool _usePollingMode;
+    private readonly TimeSpan _printResultTimeout;
 
     public ReceiptService(
         IHttpClientFactory httpClientFactory,
@@ -38,6 +39,7 @@ public class ReceiptService : IReceiptService
         _restaurantPhone = configuration.GetValue<string>("Receipt:RestaurantPhone") ?? "+63 XXX XXX XXXX";
         _restaurantEmail = configuration.GetValue<string>("Receipt:RestaurantEmail") ?? "info@restaurant.com";
         _usePollingMode = configuration.GetValue<bool>("Receipt:UsePollingMode", true); // Default to polling mode
+        _printResultTimeout = TimeSpan.FromSeconds(configuration.GetValue<int>("Receipt:PrintResultTimeoutSeconds", 30));
     }
 
     /// <inheritdoc/>
@@ -132,9 +134,26 @@ public class ReceiptService : IReceiptService
             if (response.IsSuccessStatusCode)
             {
                 var responseContent = await response.Content.ReadAsStringAsync();
-                _logger.LogInformation("Receipt printed successfully for order: {OrderNumber}. Response: {Response}", 
+                _logger.LogInformation("Receipt sent to printer for order: {OrderNumber}. Response: {Response}", 
                     receiptData.OrderNumber, responseContent);
-                return true;
+                
+                // The printer service answers 202 once the receipt is queued on the Pi;
+                // wait for the job to finish so printer failures are reported
+                string? jobId = null;
+                using (var doc = JsonDocument.Parse(responseContent))
+                {
+                    if (doc.RootElement.TryGetProperty("jobId", out var jobIdElement))
+                    {
+                        jobId = jobIdElement.GetString();
+                    }
+                }
+                
+                if (string.IsNullOrEmpty(jobId))
+                {
+                    return true; // Printed synchronously
+                }
+                
+                return await WaitForPrintJobAsync(httpClient, jobId, receiptData.OrderNumber);
             }
             else
             {
@@ -162,6 +181,51 @@ public class ReceiptService : IReceiptService
         }
     }
 
+    /// <summary>
+    /// Poll the printer service until a queued print job completes or fails
+    /// </summary>
+    private async Task<bool> WaitForPrintJobAsync(HttpClient httpClient, string jobId, string orderNumber)
+    {
+        var url = $"{_printerApiUrl}/api/receipt/job/{jobId}";
+        var deadline = DateTime.UtcNow + _printResultTimeout;
+        
+        while (DateTime.UtcNow < deadline)
+        {
+            await Task.Delay(TimeSpan.FromMilliseconds(500));
+            
+            var response = await httpClient.GetAsync(url);
+            var responseContent = await response.Content.ReadAsStringAsync();
+            
+            if (!response.IsSuccessStatusCode)
+            {
+                _logger.LogWarning("Could not get print job status for order: {OrderNumber}. Status: {StatusCode}, Error: {Error}", 
+                    orderNumber, response.StatusCode, responseContent);
+                return false;
+            }
+            
+            using var doc = JsonDocument.Parse(responseContent);
+            var status = doc.RootElement.TryGetProperty("status", out var statusElement)
+                ? statusElement.GetString()
+                : null;
+            
+            if (status == "completed")
+            {
+                _logger.LogInformation("Receipt printed for order: {OrderNumber} (job {JobId})", orderNumber, jobId);
+                return true;
+            }
+            
+            if (status == "failed")
+            {
+                _logger.LogWarning("Printer failed to print receipt for order: {OrderNumber} (job {JobId})", orderNumber, jobId);
+                return false;
+            }
+        }
+        
+        _logger.LogWarning("Receipt for order: {OrderNumber} (job {JobId}) did not finish printing within {Timeout}s", 
+            orderNumber, jobId, _printResultTimeout.TotalSeconds);
+        return false;
+    }
+
     /// <inheritdoc/>
     public async Task<bool> PrintOrderReceiptAsync(Order order, decimal? amountPaid = null, decimal? change = null)
     {
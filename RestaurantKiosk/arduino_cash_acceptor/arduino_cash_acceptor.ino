@@ -35,6 +35,7 @@
  *   "COIN:5"      - ₱5 coin accepted
  *   "COIN:10"     - ₱10 coin accepted
  *   "READY"       - System ready (sent on startup)
+ *   "PRINT:ACK"   - PRINT:START/PRINT:LINE/PRINT:BLOB chunk handled, ready for more
  *   "PRINT:OK"    - Receipt printed successfully
  *   "PRINT:ERROR" - Receipt print failed
  * 
@@ -43,6 +44,8 @@
  *   "STATUS"            - Request status
  *   "PRINT:START"       - Begin receipt print job
  *   "PRINT:LINE:text"   - Print a line of text
+ *   "PRINT:BLOB:len"    - Print len raw bytes of receipt text (lines ending in '\n'),
+ *                         sent in PRINT_BLOB_CHUNK-byte chunks, each answered by PRINT:ACK
  *   "PRINT:END"         - Finish receipt and cut paper
  * 
  * Version: 3.0 (With Receipt Printer Support)
@@ -63,6 +66,7 @@ const int LED_PIN = 13;            // Built-in LED for status indication
 SoftwareSerial printerSerial(PRINTER_TX_PIN, PRINTER_RX_PIN); // RX, TX
 bool printerEnabled = true;        // Set to false to disable printer
 bool printJobActive = false;
+const int PRINT_BLOB_CHUNK = 60;   // Bytes per PRINT:BLOB chunk - must fit the 64-byte serial RX buffer
 
 // ==================== DENOMINATION DEFINITIONS ====================
 // Philippine Peso Bill Denominations
@@ -249,6 +253,11 @@ void handleCommand(String command) {
     String text = command.substring(11);
     handlePrintLine(text);
   }
+  else if (command.startsWith("PRINT:BLOB:")) {
+    // Print a whole receipt body sent in acknowledged chunks
+    long length = command.substring(11).toInt();
+    handlePrintBlob(length);
+  }
   else if (command == "PRINT:END") {
     // End print job and cut paper
     handlePrintEnd();
@@ -403,6 +412,7 @@ void handlePrintStart() {
   delay(200);  // Longer delay for printer to fully initialize
   
   Serial.println("# Print job started");
+  Serial.println("PRINT:ACK");  // Pi waits for this before sending lines
 }
 
 void handlePrintLine(String text) {
@@ -452,6 +462,47 @@ void handlePrintLine(String text) {
   Serial.println(" chars to printer");
   
   delay(20);  // Additional delay after each line to let printer process
+  
+  Serial.println("PRINT:ACK");  // Pi sends the next line only after this
+}
+
+void handlePrintBlob(long length) {
+  // Receive receipt text in chunks; the Pi sends each chunk only after PRINT:ACK,
+  // so the serial RX buffer never holds more than one chunk
+  if (!printerEnabled || !printJobActive) {
+    Serial.println("PRINT:ERROR:NO_JOB");
+    return;
+  }
+  
+  char chunk[PRINT_BLOB_CHUNK];
+  Serial.println("PRINT:ACK");  // Ready for the first chunk
+  
+  while (length > 0) {
+    int expected = length < PRINT_BLOB_CHUNK ? length : PRINT_BLOB_CHUNK;
+    int received = Serial.readBytes(chunk, expected);  // Waits up to the 1 s serial timeout
+    
+    if (received < expected) {
+      printJobActive = false;
+      Serial.println("PRINT:ERROR:BLOB_TIMEOUT");
+      return;
+    }
+    
+    // Same filtering and pacing as handlePrintLine
+    for (int i = 0; i < received; i++) {
+      char c = chunk[i];
+      
+      if (c >= 32 && c <= 126) {
+        printerSerial.write(c);
+        delayMicroseconds(500);  // Small delay between characters
+      } else if (c == '\n') {
+        printerSerial.write('\n');
+        delay(30);  // Let printer advance paper and process the line
+      }
+    }
+    
+    length -= received;
+    Serial.println("PRINT:ACK");  // Pi sends the next chunk only after this
+  }
 }
 
 void handlePrintEnd() {
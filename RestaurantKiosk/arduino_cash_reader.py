@@ -11,50 +11,51 @@ Configuration:
 
 import serial
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
 import json
 import logging
 import os
-from typing import Optional
+import queue
+import selectors
+import threading
+from typing import Any, Dict, Mapping, Optional, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
+from kiosk_config import load_config
 
-# Load configuration from file
-def load_config():
-    """Load configuration from cash_reader_config.json"""
-    config_file = Path(__file__).parent / "cash_reader_config.json"
-    
-    # Default configuration
-    default_config = {
-        "vps_api_url": "http://localhost:5000",
-        "arduino_port": "/dev/ttyUSB0",
-        "baud_rate": 9600,
-        "reconnect_delay_seconds": 5,
-        "connection_timeout_seconds": 10,
-        "retry_attempts": 3,
-        "api_key": None,
-        "environment": "development"
+# orjson is optional; stock Pi images fall back to the stdlib json module
+try:
+    import orjson
+    json_dumps = orjson.dumps
+    json_loads = orjson.loads
+except ImportError:
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+    json_loads = json.loads
+
+# Default configuration (overridden by cash_reader_config.json)
+DEFAULT_CONFIG = {
+    "vps_api_url": "http://localhost:5000",
+    "arduino_port": "/dev/ttyUSB0",
+    "baud_rate": 9600,
+    "reconnect_delay_seconds": 5,
+    "connection_timeout_seconds": 10,
+    "retry_attempts": 3,
+    "api_key": None,
+    "environment": "development",
+    "verbose": False,
+    "long_poll_seconds": 30,
+    "denominations": {
+        "BILL": [10, 20, 50, 100, 200, 500, 1000],
+        "COIN": [1, 5, 10, 20]
     }
-    
-    try:
-        if config_file.exists():
-            with open(config_file, 'r') as f:
-                loaded_config = json.load(f)
-                default_config.update(loaded_config)
-                logger_temp = logging.getLogger(__name__)
-                logger_temp.info(f"Loaded configuration from {config_file}")
-        else:
-            logger_temp = logging.getLogger(__name__)
-            logger_temp.warning(f"Config file not found: {config_file}. Using defaults.")
-    except Exception as e:
-        logger_temp = logging.getLogger(__name__)
-        logger_temp.error(f"Error loading config: {e}. Using defaults.")
-    
-    return default_config
+}
 
 # Load configuration
-config = load_config()
+config = load_config(DEFAULT_CONFIG)
 
 # Configuration from config file
 KIOSK_API_URL = config["vps_api_url"]
@@ -64,6 +65,8 @@ RECONNECT_DELAY = config["reconnect_delay_seconds"]
 CONNECTION_TIMEOUT = config["connection_timeout_seconds"]
 RETRY_ATTEMPTS = config["retry_attempts"]
 API_KEY = config.get("api_key")
+LONG_POLL_SECONDS = config["long_poll_seconds"]
+NO_ORDER_WARNING_INTERVAL = 30.0  # Seconds between repeated "no active order" warnings
 
 # Setup logging
 logging.basicConfig(
@@ -76,6 +79,36 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Cash frame prefixes sent by the Arduino, mapped to their display label
+FRAME_HANDLERS = {b'BILL': 'Bill', b'COIN': 'Coin'}
+
+
+def build_frame_table(denominations: dict) -> Dict[bytes, Tuple[str, int]]:
+    """Map every expected cash frame (e.g. b"BILL:100") to its label and peso amount"""
+    return {
+        f"{kind}:{value}".encode(): (FRAME_HANDLERS.get(kind.encode(), kind.title()), int(value))
+        for kind, values in denominations.items()
+        for value in values
+    }
+
+
+class VpsError(Exception):
+    """Raised when the VPS API cannot be reached (after the adapter's retries)"""
+
+
+class VpsTimeout(Exception):
+    """Raised when the VPS took the request but did not answer in time
+
+    Unlike VpsError the request may already have been applied, so it must not
+    be resent blindly.
+    """
+
+
+@dataclass
+class CancelRequest:
+    """A payment cancel, queued behind the cash updates read before it"""
+    order_number: str
+
 
 @dataclass
 class CashUpdate:
@@ -99,274 +132,524 @@ class ArduinoCashReader:
         self.serial_connection: Optional[serial.Serial] = None
         self.current_order: Optional[str] = None
         self.active_sessions: dict = {}  # Cache of active payment sessions
-        self.last_poll_time: float = 0
+        self.last_poll_time: float = float('-inf')  # time.monotonic() of last poll
+        self._no_order_warned_at: float = float('-inf')  # time.monotonic() of the last no-order warning
         self.poll_interval: int = 5  # Poll for new sessions every 5 seconds
+        self.coalesce_window: float = 0.15  # Seconds to wait for the rest of a coin burst
+        self._verbose: bool = config.get("verbose", False)  # Per-coin console/log chatter
+        self._log_debug: bool = logger.isEnabledFor(logging.DEBUG)
+        self._frame_table = build_frame_table(config["denominations"])
         self.session = requests.Session()
         
+        # Keep one persistent connection to the VPS and let urllib3 handle retries/backoff.
+        # Read errors and 502/503/504 are only retried for the (idempotent) session poll;
+        # a cash update POST may already have been applied, so it is retried on connect
+        # errors only.
+        retry = Retry(
+            total=RETRY_ATTEMPTS,
+            backoff_factor=0.5,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(['GET']),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
+        # Request URLs and headers are fixed for the lifetime of the reader
+        self._poll_url = f"{api_url}/api/cash-payment/active-sessions"
+        self._update_url = f"{api_url}/api/cash-payment/update"
+        self._cancel_url_fmt = f"{api_url}/api/cash-payment/cancel/{{}}"
+        self.session.headers['Content-Type'] = 'application/json'
+        if API_KEY:
+            self.session.headers['X-API-Key'] = API_KEY
+        
+        self._partial_line: bytes = b''  # Trailing bytes of a line whose newline hasn't arrived yet
+        self._tx_queue: queue.Queue = queue.Queue()  # Cash updates and cancels waiting to be sent
+        self._sessions_lock = threading.Lock()
+        self._sel = selectors.DefaultSelector()  # Wakes read_loop only when the Arduino sends data
+        self._sel_key: Optional[selectors.SelectorKey] = None
+        self._last_etag: Optional[str] = None  # ETag of the last active-sessions response
+        self._cursor: Optional[str] = None  # Long-poll cursor from the last active-sessions response
+        
+    def _request(self, method: str, url: str, **kwargs) -> Tuple[int, Any, Mapping[str, str]]:
+        """Send a request to the VPS API through the retrying session
+        
+        Returns (status code, decoded JSON body or None, response headers).
+        Raises VpsError if the request never reached the VPS, and VpsTimeout if
+        it was sent but no answer came back in time.
+        """
+        kwargs.setdefault('timeout', CONNECTION_TIMEOUT)
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.exceptions.ConnectionError as e:
+            # Includes ConnectTimeout: nothing was delivered
+            raise VpsError(f"Cannot reach VPS API at {url}: {e}") from e
+        except requests.exceptions.Timeout as e:
+            raise VpsTimeout(f"Request timeout calling {url}") from e
+        
+        data = None
+        if response.content:
+            try:
+                data = json_loads(response.content)
+            except ValueError:
+                logger.debug("Non-JSON response from %s: %s", url, response.status_code)
+        
+        return response.status_code, data, response.headers
+    
     def poll_active_sessions(self) -> bool:
-        """Poll VPS for active payment sessions"""
+        """Poll VPS for active payment sessions
+        
+        Sends If-None-Match with the last ETag; a 304 means the session list is
+        unchanged and the cached copy is kept without decoding anything.
+        
+        Once the VPS has returned a cursor, the request long-polls: the VPS holds
+        it for up to LONG_POLL_SECONDS and answers as soon as the sessions change.
+        """
         try:
-            url = f"{self.api_url}/api/cash-payment/active-sessions"
-            headers = {}
-            if API_KEY:
-                headers['X-API-Key'] = API_KEY
+            headers = {'If-None-Match': self._last_etag} if self._last_etag else None
             
-            response = self.session.get(url, headers=headers, timeout=CONNECTION_TIMEOUT)
+            params = None
+            timeout = CONNECTION_TIMEOUT
+            if self._cursor and LONG_POLL_SECONDS > 0:
+                params = {'wait': LONG_POLL_SECONDS, 'since': self._cursor}
+                timeout = CONNECTION_TIMEOUT + LONG_POLL_SECONDS
+            
+            status, data, response_headers = self._request(
+                'GET', self._poll_url, params=params, headers=headers, timeout=timeout
+            )
             
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('success'):
+            if status == 304:
+                return True
+            
+            if status == 200:
+                if data and data.get('success'):
                     new_sessions = {s['orderNumber']: s for s in data.get('sessions', [])}
                     
                     # Detect new sessions
-                    for order_num, session_data in new_sessions.items():
-                        if order_num not in self.active_sessions:
-                            logger.info(f"New payment session detected: {order_num} - Amount: ₱{session_data['totalRequired']}")
-                            print(f"\n{'='*60}")
-                            print(f"NEW ORDER WAITING FOR CASH PAYMENT")
-                            print(f"Order Number: {order_num}")
-                            print(f"Total Required: ₱{session_data['totalRequired']}")
-                            print(f"Please insert cash into the acceptor")
-                            print(f"{'='*60}\n")
+                    for order_num in new_sessions.keys() - self.active_sessions.keys():
+                        session_data = new_sessions[order_num]
+                        logger.info("New payment session detected: %s - Amount: ₱%s", order_num, session_data['totalRequired'])
+                        print(f"\n{'='*60}")
+                        print(f"NEW ORDER WAITING FOR CASH PAYMENT")
+                        print(f"Order Number: {order_num}")
+                        print(f"Total Required: ₱{session_data['totalRequired']}")
+                        print(f"Please insert cash into the acceptor")
+                        print(f"{'='*60}\n")
                     
-                    # Detect completed/cancelled sessions
-                    for order_num in list(self.active_sessions.keys()):
-                        if order_num not in new_sessions:
-                            logger.info(f"Payment session completed/cancelled: {order_num}")
+                    with self._sessions_lock:
+                        # Detect completed/cancelled sessions
+                        for order_num in self.active_sessions.keys() - new_sessions.keys():
+                            logger.info("Payment session completed/cancelled: %s", order_num)
                             if self.current_order == order_num:
                                 self.current_order = None
+                        
+                        self.active_sessions = new_sessions
+                        
+                        # Auto-select the first active session if we don't have one
+                        if not self.current_order and self.active_sessions:
+                            self.current_order = next(iter(self.active_sessions))
+                            logger.info("Auto-selected order for payment: %s", self.current_order)
                     
-                    self.active_sessions = new_sessions
-                    
-                    # Auto-select the first active session if we don't have one
-                    if not self.current_order and self.active_sessions:
-                        self.current_order = list(self.active_sessions.keys())[0]
-                        logger.info(f"Auto-selected order for payment: {self.current_order}")
-                    
+                    # Only remember the ETag/cursor once the body has been applied
+                    self._last_etag = response_headers.get('ETag')
+                    self._cursor = data.get('cursor')
                     return True
                 else:
-                    logger.warning(f"API returned success=false: {data}")
+                    logger.warning("API returned success=false: %s", data)
                     return False
             else:
-                logger.error(f"Failed to poll active sessions: {response.status_code}")
+                logger.error("Failed to poll active sessions: %s", status)
                 return False
                 
-        except requests.exceptions.ConnectionError as e:
-            logger.error(f"Connection error polling active sessions: {e}")
+        except (VpsError, VpsTimeout) as e:
+            logger.error("Connection error polling active sessions: %s", e)
             return False
         except Exception as e:
-            logger.error(f"Error polling active sessions: {e}")
+            logger.error("Error polling active sessions: %s", e)
             return False
     
     def connect_arduino(self) -> bool:
         """Establish connection to Arduino"""
         try:
-            logger.info(f"Connecting to Arduino on {self.port} at {self.baud_rate} baud...")
+            logger.info("Connecting to Arduino on %s at %s baud...", self.port, self.baud_rate)
             self.serial_connection = serial.Serial(
                 port=self.port,
                 baudrate=self.baud_rate,
-                timeout=1
+                timeout=0.05  # Short blocking read so readline() returns as soon as a line arrives
             )
+            self.enable_low_latency()
+            self.watch_serial()
             time.sleep(2)  # Wait for Arduino to reset
             logger.info("Successfully connected to Arduino")
             return True
         except serial.SerialException as e:
-            logger.error(f"Failed to connect to Arduino: {e}")
+            logger.error("Failed to connect to Arduino: %s", e)
             return False
         except Exception as e:
-            logger.error(f"Unexpected error connecting to Arduino: {e}")
+            logger.error("Unexpected error connecting to Arduino: %s", e)
             return False
     
+    def enable_low_latency(self):
+        """Make the USB-serial driver deliver bytes immediately (Linux)
+        
+        FTDI/CH340 adapters batch received bytes for up to 16 ms by default.
+        Try the ASYNC_LOW_LATENCY flag first, then the FTDI latency_timer in sysfs.
+        """
+        try:
+            self.serial_connection.set_low_latency_mode(True)
+            logger.info("Low-latency mode enabled on %s", self.port)
+            return
+        except (AttributeError, ValueError, OSError) as e:
+            logger.debug("ASYNC_LOW_LATENCY not available on %s: %s", self.port, e)
+        
+        tty_name = Path(os.path.realpath(self.port)).name
+        latency_timer = Path("/sys/bus/usb-serial/devices") / tty_name / "latency_timer"
+        try:
+            latency_timer.write_bytes(b"1")
+            logger.info("FTDI latency timer set to 1 ms on %s", self.port)
+        except OSError as e:
+            logger.info("Low-latency mode not available on %s: %s", self.port, e)
+    
+    def watch_serial(self):
+        """Register the serial port's file descriptor with the read selector
+        
+        Ports without a selectable fd (e.g. Windows COM ports) fall back to
+        timed readline() calls.
+        """
+        if self._sel_key:
+            self._sel.unregister(self._sel_key.fd)  # Stale fd from a previous connection
+        try:
+            self._sel_key = self._sel.register(self.serial_connection.fileno(), selectors.EVENT_READ)
+        except (AttributeError, ValueError, OSError) as e:
+            self._sel_key = None
+            logger.debug("Serial port %s is not selectable, using timed reads: %s", self.port, e)
+    
     def disconnect_arduino(self):
         """Close Arduino connection"""
+        self._partial_line = b''
+        if self._sel_key:
+            self._sel.unregister(self._sel_key.fd)
+            self._sel_key = None
         if self.serial_connection and self.serial_connection.is_open:
             self.serial_connection.close()
             logger.info("Disconnected from Arduino")
     
     def send_cash_update(self, cash_update: CashUpdate) -> bool:
-        """Send cash amount update to kiosk API"""
-        max_retries = RETRY_ATTEMPTS
+        """Send cash amount update to kiosk API
         
-        for attempt in range(max_retries):
-            try:
-                url = f"{self.api_url}/api/cash-payment/update"
-                payload = {
-                    "orderNumber": cash_update.order_number,
-                    "amountAdded": cash_update.amount_added
-                }
-                
-                headers = {'Content-Type': 'application/json'}
-                if API_KEY:
-                    headers['X-API-Key'] = API_KEY
+        Retries with backoff for connection errors are handled by the session's
+        HTTPAdapter. If the VPS is still unreachable after that, VpsError is raised
+        so the caller can resend later; False means the VPS answered but rejected
+        the update, or took it without answering in time.
+        """
+        payload = {
+            "orderNumber": cash_update.order_number,
+            "amountAdded": cash_update.amount_added
+        }
+        body = json_dumps(payload)
+        
+        try:
+            logger.info("Sending cash update to %s: %s", self._update_url, payload)
+            status, data, _ = self._request('POST', self._update_url, data=body)
+        
+            if status == 200:
+                logger.info("Cash update successful: %s", data)
                 
-                logger.info(f"Sending cash update to {url}: {payload} (Attempt {attempt + 1}/{max_retries})")
-                response = self.session.post(url, json=payload, headers=headers, timeout=CONNECTION_TIMEOUT)
-            
-                if response.status_code == 200:
-                    data = response.json()
-                    logger.info(f"Cash update successful: {data}")
+                # Check if payment is complete
+                if data and data.get('isComplete'):
+                    logger.info("Payment completed for order %s", cash_update.order_number)
+                    with self._sessions_lock:
+                        if self.current_order == cash_update.order_number:
+                            self.current_order = None
                     
-                    # Check if payment is complete
-                    if data.get('isComplete'):
-                        logger.info(f"Payment completed for order {cash_update.order_number}")
-                        self.current_order = None
-                        
-                    return True
-                else:
-                    logger.error(f"Failed to send cash update: {response.status_code} - {response.text}")
-                    if attempt < max_retries - 1:
-                        logger.info(f"Retrying in 2 seconds...")
-                        time.sleep(2)
-                        continue
-                    return False
-                    
-            except requests.exceptions.Timeout:
-                logger.error(f"Request timeout sending cash update (attempt {attempt + 1}/{max_retries})")
-                if attempt < max_retries - 1:
-                    logger.info(f"Retrying in 2 seconds...")
-                    time.sleep(2)
-                    continue
-                return False
-            except requests.exceptions.ConnectionError as e:
-                logger.error(f"Connection error - cannot reach VPS API at {url}: {e}")
-                if attempt < max_retries - 1:
-                    logger.info(f"Retrying in 2 seconds...")
-                    time.sleep(2)
-                    continue
-                return False
-            except Exception as e:
-                logger.error(f"Error sending cash update: {e}")
-                if attempt < max_retries - 1:
-                    logger.info(f"Retrying in 2 seconds...")
-                    time.sleep(2)
-                    continue
+                return True
+            else:
+                logger.error("Failed to send cash update: %s - %s", status, data)
                 return False
-        
-        return False
+                
+        except VpsError:
+            raise
+        except VpsTimeout as e:
+            # The VPS may already have credited it; resending could credit the customer twice
+            logger.error("No answer to cash update for order %s, not resending (it may have been applied): %s",
+                         cash_update.order_number, e)
+            return False
+        except Exception as e:
+            logger.error("Error sending cash update: %s", e)
+            return False
     
-    def parse_arduino_data(self, data: str) -> Optional[CashUpdate]:
-        """Parse data received from Arduino
+    def parse_arduino_frame(self, raw: bytes) -> Optional[CashUpdate]:
+        """Parse a raw line received from Arduino
         
         Expected format from Arduino:
-        - "BILL:100" - ₱100 bill inserted
-        - "COIN:5" - ₱5 coin inserted
-        - "CANCEL" - Cancel current order
+        - b"BILL:100" - ₱100 bill inserted
+        - b"COIN:5" - ₱5 coin inserted
+        - b"CANCEL" - Cancel current order
         
         Note: Order number is auto-selected from active sessions (no need for ORDER: command)
         """
         try:
-            data = data.strip()
+            raw = raw.rstrip(b'\r\n')
             
-            if not data:
-                return None
-            
-            logger.debug(f"Received from Arduino: {data}")
-            
-            # Handle cancel command
-            if data == "CANCEL":
-                if self.current_order:
-                    logger.info(f"Cancelling payment for order: {self.current_order}")
-                    self.cancel_payment(self.current_order)
-                    self.current_order = None
-                return None
+            if self._log_debug:
+                logger.debug("Received from Arduino: %r", raw)
             
-            # Handle cash insertion
-            if not self.current_order:
-                logger.warning("Received cash data but no active order session. Waiting for order from VPS...")
-                return None
+            # Configured denominations resolve with a single lookup
+            frame = self._frame_table.get(raw)
             
-            amount = 0.0
+            if frame is None:
+                if not raw:
+                    return None
+                
+                # Handle cancel command; the POST goes out on the sender thread so
+                # serial reads are not held up by it
+                if raw == b'CANCEL':
+                    with self._sessions_lock:
+                        order_number, self.current_order = self.current_order, None
+                    if order_number:
+                        logger.info("Cancelling payment for order: %s", order_number)
+                        self._tx_queue.put(CancelRequest(order_number))
+                    return None
+                
+                frame = self._parse_unlisted_frame(raw)
+                if frame is None:
+                    return None
             
-            if data.startswith("BILL:"):
-                amount = float(data.split(":", 1)[1])
-                logger.info(f"Bill inserted: ₱{amount} for order {self.current_order}")
-                print(f"✓ Bill: ₱{amount} (Order: {self.current_order})")
-            elif data.startswith("COIN:"):
-                amount = float(data.split(":", 1)[1])
-                logger.info(f"Coin inserted: ₱{amount} for order {self.current_order}")
-                print(f"✓ Coin: ₱{amount} (Order: {self.current_order})")
-            else:
-                logger.warning(f"Unknown Arduino command: {data}")
+            # Handle cash insertion; read the order once, the session poller may change it
+            with self._sessions_lock:
+                order_number = self.current_order
+            if not order_number:
+                # Cash fed in with no order repeats the frame per coin/bill; warn once per interval
+                now = time.monotonic()
+                if now - self._no_order_warned_at >= NO_ORDER_WARNING_INTERVAL:
+                    self._no_order_warned_at = now
+                    logger.warning("Received cash data but no active order session. Waiting for order from VPS...")
+                else:
+                    logger.debug("Ignoring %r: no active order session", raw)
                 return None
             
-            if amount > 0:
-                return CashUpdate(
-                    order_number=self.current_order,
-                    amount_added=amount
-                )
+            label, amount = frame
+            if self._verbose:
+                logger.info("%s inserted: ₱%s for order %s", label, amount, order_number)
+                print(f"✓ {label}: ₱{amount} (Order: {order_number})")
             
-            return None
+            return CashUpdate(
+                order_number=order_number,
+                amount_added=amount
+            )
             
         except ValueError as e:
-            logger.error(f"Error parsing amount: {e}")
+            logger.error("Error parsing amount: %s", e)
             return None
         except Exception as e:
-            logger.error(f"Error parsing Arduino data: {e}")
+            logger.error("Error parsing Arduino data: %s", e)
             return None
     
+    def _parse_unlisted_frame(self, raw: bytes) -> Optional[Tuple[str, int]]:
+        """Parse a BILL/COIN frame whose amount is not in the configured denominations
+        
+        These are still credited but logged so the denominations config can be
+        brought in line with the acceptor. The firmware also answers a TEST:BILL:n /
+        TEST:COIN:n command with a plain BILL:n / COIN:n frame, which lands here
+        when n is not configured; anything else (e.g. an unknown TEST:... frame)
+        is logged as unknown and never credited.
+        """
+        kind, _, value = raw.partition(b':')
+        label = FRAME_HANDLERS.get(kind)
+        
+        if label is None:
+            logger.warning("Unknown Arduino command: %r", raw)
+            return None
+        
+        # Denominations are whole pesos
+        amount = int(value)
+        if amount <= 0:
+            return None
+        
+        logger.warning("%s of ₱%s is not a configured denomination", label, amount)
+        return label, amount
+    
     def cancel_payment(self, order_number: str) -> bool:
-        """Cancel payment for an order"""
+        """Cancel payment for an order
+        
+        Raises VpsError if the VPS could not be reached, so the caller can resend
+        the cancel later.
+        """
         try:
-            url = f"{self.api_url}/api/cash-payment/cancel/{order_number}"
-            response = self.session.post(url, timeout=5)
+            url = self._cancel_url_fmt.format(order_number)
+            status, _, _ = self._request('POST', url)
             
-            if response.status_code == 200:
-                logger.info(f"Payment cancelled successfully for order {order_number}")
+            if status == 200:
+                logger.info("Payment cancelled successfully for order %s", order_number)
                 return True
             else:
-                logger.error(f"Failed to cancel payment: {response.status_code}")
+                logger.error("Failed to cancel payment: %s", status)
                 return False
                 
+        except VpsError:
+            raise
+        except VpsTimeout as e:
+            logger.error("No answer to cancel for order %s: %s", order_number, e)
+            return False
         except Exception as e:
-            logger.error(f"Error cancelling payment: {e}")
+            logger.error("Error cancelling payment: %s", e)
             return False
     
+    def _sessions_loop(self):
+        """Poll VPS for active payment sessions on a separate thread
+        
+        Keeps slow VPS responses from stalling serial reads. When the VPS supports
+        long-polling the next request goes out immediately; otherwise (or after an
+        error) polls are spaced poll_interval apart.
+        """
+        while True:
+            started = time.monotonic()
+            ok = False
+            try:
+                ok = self.poll_active_sessions()
+                self.last_poll_time = started
+                
+                # Display current status
+                if self.active_sessions:
+                    logger.info("Active payment sessions: %s", len(self.active_sessions))
+                    if self.current_order:
+                        session = self.active_sessions.get(self.current_order)
+                        if session:
+                            logger.info("Current order: %s - ₱%s/₱%s", self.current_order,
+                                        session['amountInserted'], session['totalRequired'])
+                else:
+                    logger.debug("No active payment sessions. Waiting for orders...")
+            except Exception as e:
+                logger.error("Unexpected error in session poll loop: %s", e)
+            
+            if ok and self._cursor:
+                continue  # The VPS already waited for a change
+            
+            time.sleep(max(0.0, self.poll_interval - (time.monotonic() - started)))
+    
+    def _tx_worker(self):
+        """Send queued cash updates to the VPS on a separate thread
+        
+        The serial loop only enqueues, so coins keep being read while a POST is in flight.
+        Updates arriving within coalesce_window of each other are summed per order and
+        sent as a single POST, so a burst of coins costs one round-trip.
+        
+        Updates and cancels that could not reach the VPS are retried after
+        RECONNECT_DELAY, ahead of anything read in the meantime, so inserted cash
+        is never dropped during an outage.
+        
+        Cancels are sent after the batch's cash updates, and an order's cancel is
+        held back while any of its cash is still unsent, so cash read before a
+        CANCEL always reaches its order first.
+        """
+        retry = []
+        while True:
+            taken = 0
+            if retry:
+                batch, retry = retry, []
+            else:
+                batch = [self._tx_queue.get()]
+                taken = 1
+            
+            # Give the rest of a coin burst time to arrive, then drain it
+            time.sleep(self.coalesce_window)
+            while True:
+                try:
+                    batch.append(self._tx_queue.get_nowait())
+                    taken += 1
+                except queue.Empty:
+                    break
+            
+            totals = {}
+            cancels = []
+            for item in batch:
+                if isinstance(item, CancelRequest):
+                    cancels.append(item.order_number)
+                else:
+                    totals[item.order_number] = totals.get(item.order_number, 0) + item.amount_added
+            
+            if len(batch) - len(cancels) > len(totals):
+                logger.info("Coalesced %s cash events into %s update(s)", len(batch) - len(cancels), len(totals))
+            
+            unsent = []
+            unsent_orders = set()
+            for order_number, amount in totals.items():
+                cash_update = CashUpdate(order_number=order_number, amount_added=amount)
+                try:
+                    self.send_cash_update(cash_update)
+                except VpsError as e:
+                    logger.error("Cash update for order %s not delivered: %s", order_number, e)
+                    unsent.append(cash_update)
+                    unsent_orders.add(order_number)
+                except Exception as e:
+                    logger.error("Unexpected error sending cash update: %s", e)
+            
+            for order_number in cancels:
+                if order_number in unsent_orders:
+                    # The order's cash has to land first; cancel right after it is resent
+                    unsent.append(CancelRequest(order_number))
+                    continue
+                try:
+                    self.cancel_payment(order_number)
+                except VpsError as e:
+                    logger.error("Cancel for order %s not delivered: %s", order_number, e)
+                    unsent.append(CancelRequest(order_number))
+                except Exception as e:
+                    logger.error("Unexpected error cancelling payment: %s", e)
+            
+            if unsent:
+                logger.warning("Resending %s update(s) in %s seconds", len(unsent), RECONNECT_DELAY)
+                time.sleep(RECONNECT_DELAY)
+                retry = unsent
+            
+            for _ in range(taken):
+                self._tx_queue.task_done()
+    
+    def _start_background_threads(self):
+        """Start the session poller and cash update sender threads"""
+        threading.Thread(target=self._sessions_loop, name="SessionPoller", daemon=True).start()
+        threading.Thread(target=self._tx_worker, name="CashSender", daemon=True).start()
+    
     def read_loop(self):
-        """Main loop to read Arduino data and send updates"""
+        """Main loop to read Arduino data and queue updates for the VPS"""
         logger.info("Starting cash reader loop...")
         logger.info("Polling VPS for active payment sessions...")
+        self._start_background_threads()
         
         while True:
             try:
-                # Poll VPS for active payment sessions periodically
-                current_time = time.time()
-                if current_time - self.last_poll_time >= self.poll_interval:
-                    self.poll_active_sessions()
-                    self.last_poll_time = current_time
-                    
-                    # Display current status
-                    if self.active_sessions:
-                        logger.info(f"Active payment sessions: {len(self.active_sessions)}")
-                        if self.current_order:
-                            session = self.active_sessions.get(self.current_order)
-                            if session:
-                                logger.info(f"Current order: {self.current_order} - "
-                                          f"₱{session['amountInserted']}/₱{session['totalRequired']}")
-                    else:
-                        logger.debug("No active payment sessions. Waiting for orders...")
-                
                 # Connect to Arduino if not connected
                 if not self.serial_connection or not self.serial_connection.is_open:
                     if not self.connect_arduino():
-                        logger.warning(f"Retrying Arduino connection in {RECONNECT_DELAY} seconds...")
+                        logger.warning("Retrying Arduino connection in %s seconds...", RECONNECT_DELAY)
                         time.sleep(RECONNECT_DELAY)
                         continue
                 
-                # Read line from Arduino
-                if self.serial_connection.in_waiting > 0:
-                    line = self.serial_connection.readline().decode('utf-8', errors='ignore')
-                    
+                # Sleep in the kernel until bytes arrive instead of spinning on short read timeouts
+                if self._sel_key and not self._sel.select(timeout=1.0):
+                    continue
+                
+                # Take everything the driver has buffered in one read; fall back to a
+                # blocking readline() when nothing is queued (or the port isn't selectable)
+                waiting = self.serial_connection.in_waiting
+                chunk = self.serial_connection.read(waiting) if waiting else self.serial_connection.readline()
+                if not chunk:
+                    continue
+                
+                # The last piece is an incomplete line (or b''); keep it until its newline arrives
+                *lines, self._partial_line = (self._partial_line + chunk).split(b'\n')
+                
+                for line in lines:
                     # Parse and process the data
-                    cash_update = self.parse_arduino_data(line)
+                    cash_update = self.parse_arduino_frame(line)
                     
                     if cash_update:
-                        # Send update to API
-                        self.send_cash_update(cash_update)
-                
-                time.sleep(0.1)  # Small delay to prevent CPU spinning
+                        # Hand off to the sender thread
+                        self._tx_queue.put(cash_update)
                 
             except serial.SerialException as e:
-                logger.error(f"Serial communication error: {e}")
+                logger.error("Serial communication error: %s", e)
                 self.disconnect_arduino()
                 time.sleep(RECONNECT_DELAY)
                 
@@ -375,7 +658,7 @@ class ArduinoCashReader:
                 break
                 
             except Exception as e:
-                logger.error(f"Unexpected error in read loop: {e}")
+                logger.error("Unexpected error in read loop: %s", e)
                 time.sleep(1)
         
         self.disconnect_arduino()
@@ -386,16 +669,16 @@ def main():
     logger.info("=" * 60)
     logger.info("Restaurant Kiosk - Arduino Cash Reader (Polling Mode)")
     logger.info("=" * 60)
-    logger.info(f"Environment: {config.get('environment', 'development')}")
-    logger.info(f"Arduino Port: {ARDUINO_PORT}")
-    logger.info(f"Baud Rate: {BAUD_RATE}")
-    logger.info(f"VPS API URL: {KIOSK_API_URL}")
-    logger.info(f"Connection Timeout: {CONNECTION_TIMEOUT}s")
-    logger.info(f"Retry Attempts: {RETRY_ATTEMPTS}")
-    logger.info(f"API Key Configured: {'Yes' if API_KEY else 'No'}")
+    logger.info("Environment: %s", config.get('environment', 'development'))
+    logger.info("Arduino Port: %s", ARDUINO_PORT)
+    logger.info("Baud Rate: %s", BAUD_RATE)
+    logger.info("VPS API URL: %s", KIOSK_API_URL)
+    logger.info("Connection Timeout: %ss", CONNECTION_TIMEOUT)
+    logger.info("Retry Attempts: %s", RETRY_ATTEMPTS)
+    logger.info("API Key Configured: %s", 'Yes' if API_KEY else 'No')
     logger.info("=" * 60)
     logger.info("POLLING ARCHITECTURE:")
-    logger.info("- Raspberry Pi polls VPS every 5 seconds for active payment sessions")
+    logger.info("- Raspberry Pi long-polls VPS for active payment sessions (up to %ss per request)", LONG_POLL_SECONDS)
     logger.info("- When new order detected, cash acceptor is ready to receive payment")
     logger.info("- Arduino sends cash data → Python → VPS (updates session)")
     logger.info("- Browser polls VPS for status updates")
@@ -413,7 +696,7 @@ def main():
     try:
         reader.read_loop()
     except Exception as e:
-        logger.error(f"Fatal error: {e}")
+        logger.error("Fatal error: %s", e)
     finally:
         reader.disconnect_arduino()
         logger.info("Cash reader stopped")
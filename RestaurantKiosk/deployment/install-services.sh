@@ -59,6 +59,15 @@ echo
 if [[ $REPLY =~ ^[Yy]$ ]]; then
     print_info "Creating Arduino Cash Reader service..."
     
+    # arduino_cash_reader.py imports the shared config loader from kiosk_config.py
+    for script in arduino_cash_reader.py kiosk_config.py; do
+        if [ ! -f "$APP_DIR/$script" ]; then
+            print_error "$script not found in $APP_DIR"
+            echo "Please copy arduino_cash_reader.py and kiosk_config.py to $APP_DIR first"
+            exit 1
+        fi
+    done
+    
     sudo tee /etc/systemd/system/arduino-cash-reader.service > /dev/null << EOF
 [Unit]
 Description=Arduino Cash Reader Service
@@ -71,6 +71,12 @@ if [ ! -f "kiosk_peripherals.py" ]; then
     exit 1
 fi
 
+if [ ! -f "kiosk_config.py" ]; then
+    echo -e "${RED}Error: kiosk_config.py not found in current directory${NC}"
+    echo "Please copy kiosk_config.py (shared config loader) to $INSTALL_DIR first"
+    exit 1
+fi
+
 # Make script executable
 chmod +x kiosk_peripherals.py
 
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Shared configuration loader for the Restaurant Kiosk peripheral scripts
+Reads cash_reader_config.json and merges it over each script's defaults
+
+The decoded file is cached by (path, mtime), so repeated loads only hit the
+disk again after the file has been edited.
+"""
+
+import functools
+import json
+import logging
+from pathlib import Path
+
+CONFIG_FILE = Path(__file__).parent / "cash_reader_config.json"
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=4)
+def _load(path: str, mtime: float) -> dict:
+    """Read and decode a config file (cached until its mtime changes)"""
+    return json.loads(Path(path).read_text())
+
+
+def load_config(defaults: dict, config_file: Path = CONFIG_FILE) -> dict:
+    """Return defaults overridden by the values in config_file"""
+    config = dict(defaults)
+    
+    try:
+        st = config_file.stat()
+    except FileNotFoundError:
+        logger.warning(f"Config file not found: {config_file}. Using defaults.")
+        return config
+    
+    try:
+        config.update(_load(str(config_file), st.st_mtime))
+        logger.info(f"Loaded configuration from {config_file}")
+    except Exception as e:
+        logger.error(f"Error loading config: {e}. Using defaults.")
+    
+    return config
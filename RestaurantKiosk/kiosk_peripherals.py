@@ -9,16 +9,36 @@ This unified script simplifies deployment by managing all peripherals in one pro
 
 import serial
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
+import functools
 import json
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import os
+import queue
+import random
+import selectors
+import socket
 import threading
-from typing import Optional, Dict, Any
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
+from kiosk_config import load_config
+
+# orjson is optional; stock Pi images fall back to the stdlib json module
+try:
+    import orjson
+    json_dumps = orjson.dumps
+    json_loads = orjson.loads
+except ImportError:
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+    json_loads = json.loads
+
 # ESC/POS printer library no longer needed - Arduino handles printing directly
 # from escpos.printer import Usb, Network, Serial as ESCPOSSerial, File
 # from escpos.exceptions import USBNotFoundError, Error as ESCPOSError
@@ -27,53 +47,44 @@ from pathlib import Path
 # CONFIGURATION
 # ============================================================================
 
-def load_config():
-    """Load configuration from cash_reader_config.json"""
-    config_file = Path(__file__).parent / "cash_reader_config.json"
-    
-    # Default configuration
-    default_config = {
-        "vps_api_url": "http://localhost:5000",
-        "arduino_port": "/dev/ttyUSB0",
-        "arduino_baud_rate": 9600,
-        "printer_type": "serial",  # serial, usb, network, file
-        "printer_serial_port": "/dev/ttyUSB0",
-        "printer_serial_baudrate": 9600,
-        "printer_usb_vendor_id": "0x04b8",
-        "printer_usb_product_id": "0x0e15",
-        "reconnect_delay_seconds": 5,
-        "connection_timeout_seconds": 10,
-        "retry_attempts": 3,
-        "cash_poll_interval": 5,
-        "printer_poll_interval": 2,
-        "api_key": None,
-        "environment": "development",
-        "enable_cash_reader": True,
-        "enable_printer": True
-    }
-    
-    try:
-        if config_file.exists():
-            with open(config_file, 'r') as f:
-                loaded_config = json.load(f)
-                default_config.update(loaded_config)
-                logger_temp = logging.getLogger(__name__)
-                logger_temp.info(f"Loaded configuration from {config_file}")
-        else:
-            logger_temp = logging.getLogger(__name__)
-            logger_temp.warning(f"Config file not found: {config_file}. Using defaults.")
-    except Exception as e:
-        logger_temp = logging.getLogger(__name__)
-        logger_temp.error(f"Error loading config: {e}. Using defaults.")
-    
-    return default_config
+# Default configuration (overridden by cash_reader_config.json)
+DEFAULT_CONFIG = {
+    "vps_api_url": "http://localhost:5000",
+    "arduino_port": "/dev/ttyUSB0",
+    "arduino_baud_rate": 9600,
+    "printer_type": "serial",  # serial, usb, network, file
+    "printer_serial_port": "/dev/ttyUSB0",
+    "printer_serial_baudrate": 9600,
+    "printer_usb_vendor_id": "0x04b8",
+    "printer_usb_product_id": "0x0e15",
+    "reconnect_delay_seconds": 5,
+    "max_reconnect_delay_seconds": 30,  # Cap for the doubling delay while the Arduino is unplugged
+    "connection_timeout_seconds": 10,
+    "retry_attempts": 3,
+    "cash_poll_interval": 5,
+    "cash_long_poll_seconds": 30,
+    "printer_poll_interval": 2,
+    "printer_long_poll_seconds": 25,
+    "api_key": None,
+    "environment": "development",
+    "enable_cash_reader": True,
+    "enable_printer": True
+}
 
 # Load configuration
-config = load_config()
+config = load_config(DEFAULT_CONFIG)
+
+# Writes log records to the file/console on its own thread (stopped in main())
+log_listener: Optional[QueueListener] = None
 
 # Setup logging with rotation
 def setup_logging():
-    """Configure logging with rotation and UTF-8 encoding"""
+    """Configure logging with rotation and UTF-8 encoding
+    
+    Handlers run on a QueueListener thread, so a logging call on the serial or
+    HTTP threads only enqueues the record instead of blocking on file writes.
+    """
+    global log_listener
     log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     
     # File handler with rotation (max 10MB, keep 5 backup files)
@@ -95,20 +106,118 @@ def setup_logging():
         sys.stdout.reconfigure(encoding='utf-8')
         sys.stderr.reconfigure(encoding='utf-8')
     
+    log_queue: queue.Queue = queue.Queue(-1)
+    log_listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    log_listener.start()
+    
     # Configure root logger
     root_logger = logging.getLogger()
     root_logger.setLevel(logging.INFO)
-    root_logger.addHandler(file_handler)
-    root_logger.addHandler(console_handler)
+    root_logger.addHandler(QueueHandler(log_queue))
     
     return logging.getLogger(__name__)
 
 logger = setup_logging()
 
+
+def create_session(api_key: Optional[str] = None) -> requests.Session:
+    """Create a keep-alive HTTP session for VPS calls
+    
+    A small connection pool avoids repeat TCP/TLS handshakes on every poll, and
+    urllib3 retries connection errors with backoff.
+    
+    Only requests that never reached the VPS are retried. The cash update POST
+    and the print-job poll (which dequeues) are not idempotent: after a read
+    timeout or a gateway 502/504 the VPS may already have applied them, so the
+    callers decide what to do instead of urllib3 silently sending them again.
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=config["retry_attempts"],
+        connect=config["retry_attempts"],
+        read=0,
+        status=0,
+        backoff_factor=0.5,
+        allowed_methods=frozenset(['GET', 'POST'])
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    # Request bodies are pre-encoded with json_dumps and sent as data=
+    session.headers['Content-Type'] = 'application/json'
+    if api_key:
+        session.headers['X-API-Key'] = api_key
+    return session
+
+def body_excerpt(response: requests.Response, limit: int = 512) -> str:
+    """First `limit` bytes of a response body for error logs (e.g. an HTML error page)"""
+    body = response.content[:limit].decode('utf-8', errors='replace')
+    return body + '...' if len(response.content) > limit else body
+
 # ============================================================================
 # CASH READER MODULE
 # ============================================================================
 
+# Cash frame prefixes and how they are logged
+CASH_FRAME_LABELS = {b'BILL': 'Bill', b'COIN': 'Coin'}
+
+# Denominations the Arduino sketch emits (billValues/coinValues)
+CASH_DENOMINATIONS = {b'BILL': (10, 20, 50, 100, 200, 500, 1000), b'COIN': (1, 5, 10, 20)}
+
+# Every expected cash frame (e.g. b"BILL:100") -> (label, peso amount), so a
+# known frame is parsed with a single dict lookup
+CASH_FRAMES = {
+    kind + b':' + str(value).encode(): (CASH_FRAME_LABELS[kind], float(value))
+    for kind, values in CASH_DENOMINATIONS.items()
+    for value in values
+}
+
+# Seconds between repeated "no active order" warnings; cash in between is logged at debug
+NO_ORDER_WARNING_INTERVAL = 30.0
+
+# Recently printed job IDs kept so a job the VPS hands out again is not printed twice
+PRINTED_JOB_HISTORY = 256
+
+
+class VpsError(Exception):
+    """Raised when the VPS API cannot be reached (after the adapter's retries)"""
+
+
+class SharedSerial:
+    """Write side of the Arduino port, shared by the cash reader and printer client
+    
+    Writes from both threads go through one lock so commands never interleave
+    mid-line; hold `lock` to keep a multi-write sequence together. The cash
+    reader re-attaches the port after every reconnect, so holders never write
+    to a stale connection. Reads stay on the cash reader thread, unlocked.
+    """
+    
+    def __init__(self):
+        self._port: Optional[serial.Serial] = None
+        self.lock = threading.RLock()
+    
+    def attach(self, port: Optional[serial.Serial]):
+        """Point at a newly opened port (None while disconnected)"""
+        with self.lock:
+            self._port = port
+    
+    @property
+    def is_open(self) -> bool:
+        port = self._port
+        return bool(port and port.is_open)
+    
+    def write(self, data: bytes) -> int:
+        with self.lock:
+            if self._port is None:
+                raise serial.SerialException("Arduino not connected")
+            return self._port.write(data)
+    
+    def flush(self):
+        with self.lock:
+            if self._port is not None:
+                self._port.flush()
+
+
 @dataclass
 class CashUpdate:
     """Represents a cash amount update"""
@@ -129,54 +238,90 @@ class ArduinoCashReader:
         self.baud_rate = baud_rate
         self.api_url = api_url
         self.api_key = api_key
+        # Request URLs are fixed for the lifetime of the reader
+        self._poll_url = f"{api_url}/api/cash-payment/active-sessions"
+        self._update_url = f"{api_url}/api/cash-payment/update"
+        self._cancel_url_fmt = f"{api_url}/api/cash-payment/cancel/{{}}"
         self.serial_connection: Optional[serial.Serial] = None
         self.current_order: Optional[str] = None
         self.active_sessions: dict = {}
-        self.last_poll_time: float = 0
+        self.last_poll_time: float = float('-inf')  # time.monotonic() of last poll
         self.poll_interval: int = config["cash_poll_interval"]
-        self.session = requests.Session()
+        self.session = create_session(api_key)
         self.running = False
+        self._partial_line: bytes = b''  # Bytes of a line cut short by the read timeout
+        self._sessions_lock = threading.Lock()  # Guards current_order/active_sessions across threads
+        self._tx_queue: queue.Queue = queue.Queue()  # Cash updates waiting to be sent
+        self.print_responses: queue.Queue = queue.Queue()  # PRINT:* replies for the printer client
+        self._sel = selectors.DefaultSelector()  # Wakes run() only when the Arduino sends data
+        # stop() writes to this pair so run() can block in select() with no timeout
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._sel.register(self._wake_r, selectors.EVENT_READ)
+        self._sel_key: Optional[selectors.SelectorKey] = None
+        self.shared_port = SharedSerial()  # Locked write access for the printer client
+        self.ready_event = threading.Event()  # Set once the Arduino has booted and sent READY
+        self._stop_event = threading.Event()  # Cuts short the reader's waits on shutdown
+        # Config values read on every request/retry, looked up once here
+        self._timeout: float = config["connection_timeout_seconds"]
+        self._base_reconnect_delay: float = config["reconnect_delay_seconds"]
+        self._max_reconnect_delay: float = config["max_reconnect_delay_seconds"]
+        self._reconnect_delay: float = self._base_reconnect_delay  # Doubles per failed attempt
+        self.coalesce_window: float = 0.25  # Seconds to wait for the rest of a coin burst
+        self.long_poll_seconds: int = config["cash_long_poll_seconds"]
+        self._last_etag: Optional[str] = None  # ETag of the last active-sessions response
+        self._cursor: Optional[str] = None  # Long-poll cursor from the last active-sessions response
+        self._no_order_warned_at: float = float('-inf')  # time.monotonic() of the last no-order warning
         
     def poll_active_sessions(self) -> bool:
-        """Poll VPS for active payment sessions"""
+        """Poll VPS for active payment sessions
+        
+        Once the VPS has returned a cursor, the request long-polls: the VPS holds it
+        for up to long_poll_seconds and answers as soon as the sessions change, or
+        with 304 Not Modified (matching If-None-Match) when nothing changed.
+        """
         try:
-            url = f"{self.api_url}/api/cash-payment/active-sessions"
-            headers = {}
-            if self.api_key:
-                headers['X-API-Key'] = self.api_key
+            url = self._poll_url
+            headers = {'If-None-Match': self._last_etag} if self._last_etag else None
+            
+            params = None
+            timeout = self._timeout
+            if self._cursor and self.long_poll_seconds > 0:
+                params = {'wait': self.long_poll_seconds, 'since': self._cursor}
+                timeout += self.long_poll_seconds
             
-            response = self.session.get(url, headers=headers, timeout=config["connection_timeout_seconds"])
+            response = self.session.get(url, params=params, headers=headers, timeout=timeout)
+            
+            if response.status_code == 304:
+                return True
             
             if response.status_code == 200:
-                data = response.json()
+                data = json_loads(response.content)
                 if data.get('success'):
                     new_sessions = {s['orderNumber']: s for s in data.get('sessions', [])}
                     
                     # Detect new sessions
-                    for order_num, session_data in new_sessions.items():
-                        if order_num not in self.active_sessions:
-                            logger.info(f"[CASH] New payment session detected: {order_num} - Amount: ₱{session_data['totalRequired']}")
-                            print(f"\n{'='*60}")
-                            print(f"NEW ORDER WAITING FOR CASH PAYMENT")
-                            print(f"Order Number: {order_num}")
-                            print(f"Total Required: ₱{session_data['totalRequired']}")
-                            print(f"Please insert cash into the acceptor")
-                            print(f"{'='*60}\n")
+                    for order_num in new_sessions.keys() - self.active_sessions.keys():
+                        session_data = new_sessions[order_num]
+                        logger.info(f"[CASH] New payment session detected: {order_num} - Amount: ₱{session_data['totalRequired']}")
                     
-                    # Detect completed/cancelled sessions
-                    for order_num in list(self.active_sessions.keys()):
-                        if order_num not in new_sessions:
+                    with self._sessions_lock:
+                        # Detect completed/cancelled sessions
+                        for order_num in self.active_sessions.keys() - new_sessions.keys():
                             logger.info(f"[CASH] Payment session completed/cancelled: {order_num}")
                             if self.current_order == order_num:
                                 self.current_order = None
+                        
+                        self.active_sessions = new_sessions
+                        
+                        # Auto-select the first active session if we don't have one
+                        if not self.current_order and self.active_sessions:
+                            self.current_order = next(iter(self.active_sessions))
+                            logger.info(f"[CASH] Auto-selected order for payment: {self.current_order}")
                     
-                    self.active_sessions = new_sessions
-                    
-                    # Auto-select the first active session if we don't have one
-                    if not self.current_order and self.active_sessions:
-                        self.current_order = list(self.active_sessions.keys())[0]
-                        logger.info(f"[CASH] Auto-selected order for payment: {self.current_order}")
-                    
+                    # Only remember the ETag/cursor once the body has been applied
+                    self._last_etag = response.headers.get('ETag')
+                    self._cursor = data.get('cursor')
                     return True
                 else:
                     logger.warning(f"[CASH] API returned success=false: {data}")
@@ -199,9 +344,13 @@ class ArduinoCashReader:
             self.serial_connection = serial.Serial(
                 port=self.port,
                 baudrate=self.baud_rate,
-                timeout=1
+                timeout=0.25  # Blocking readline() returns as soon as a line arrives
             )
-            time.sleep(2)  # Wait for Arduino to reset
+            self.enable_low_latency()
+            self.watch_serial()
+            self.shared_port.attach(self.serial_connection)
+            self._stop_event.wait(2)  # Wait for Arduino to reset
+            self._reconnect_delay = self._base_reconnect_delay
             logger.info("[CASH] Successfully connected to Arduino")
             return True
         except serial.SerialException as e:
@@ -211,8 +360,68 @@ class ArduinoCashReader:
             logger.error(f"[CASH] Unexpected error connecting to Arduino: {e}")
             return False
     
+    def enable_low_latency(self):
+        """Make the USB-serial driver deliver bytes immediately (Linux)
+        
+        FTDI/CH340 adapters batch received bytes for up to 16 ms by default.
+        Try the ASYNC_LOW_LATENCY flag first, then the FTDI latency_timer in sysfs.
+        """
+        try:
+            self.serial_connection.set_low_latency_mode(True)
+            logger.info(f"[CASH] Low-latency mode enabled on {self.port}")
+            return
+        except (AttributeError, ValueError, OSError) as e:
+            logger.debug(f"[CASH] ASYNC_LOW_LATENCY not available on {self.port}: {e}")
+        
+        tty_name = Path(os.path.realpath(self.port)).name
+        latency_timer = Path("/sys/bus/usb-serial/devices") / tty_name / "latency_timer"
+        try:
+            latency_timer.write_bytes(b"1")
+            logger.info(f"[CASH] FTDI latency timer set to 1 ms on {self.port}")
+        except OSError as e:
+            logger.info(f"[CASH] Low-latency mode not available on {self.port}: {e}")
+    
+    def watch_serial(self):
+        """Register the serial port's file descriptor with the read selector
+        
+        Ports without a selectable fd (e.g. Windows COM ports) fall back to
+        timed readline() calls.
+        """
+        if self._sel_key:
+            self._sel.unregister(self._sel_key.fd)  # Stale fd from a previous connection
+        try:
+            self._sel_key = self._sel.register(self.serial_connection.fileno(), selectors.EVENT_READ)
+        except (AttributeError, ValueError, OSError) as e:
+            self._sel_key = None
+            logger.debug(f"[CASH] Serial port {self.port} is not selectable, using timed reads: {e}")
+    
+    def stop(self):
+        """Ask run() and the session poller to exit, waking them from any wait"""
+        self.running = False
+        self._stop_event.set()
+        try:
+            self._wake_w.send(b'\0')
+        except OSError:
+            pass  # Already has a wake-up pending
+    
+    def wait_before_reconnect(self):
+        """Sleep before the next connection attempt, backing off exponentially
+        
+        The delay doubles after every failure up to max_reconnect_delay_seconds,
+        so a long outage doesn't spin on open() and flood the log.
+        """
+        logger.warning(f"[CASH] Retrying Arduino connection in {self._reconnect_delay}s...")
+        self._stop_event.wait(self._reconnect_delay)
+        self._reconnect_delay = min(self._reconnect_delay * 2, self._max_reconnect_delay)
+    
     def disconnect_arduino(self):
         """Close Arduino connection"""
+        self._partial_line = b''
+        if self._sel_key:
+            self._sel.unregister(self._sel_key.fd)
+            self._sel_key = None
+        self.shared_port.attach(None)  # Waits for any write in progress
+        self.ready_event.clear()
         if self.serial_connection and self.serial_connection.is_open:
             self.serial_connection.close()
             logger.info("[CASH] Disconnected from Arduino")
@@ -228,8 +437,8 @@ class ArduinoCashReader:
         - TEST:COIN:5 - Simulate coin insertion (testing without hardware)
         """
         try:
-            if self.serial_connection and self.serial_connection.is_open:
-                self.serial_connection.write(f"{command}\n".encode('utf-8'))
+            if self.shared_port.is_open:
+                self.shared_port.write(f"{command}\n".encode('utf-8'))
                 logger.debug(f"[CASH] Sent command to Arduino: {command}")
                 return True
             else:
@@ -240,60 +449,65 @@ class ArduinoCashReader:
             return False
     
     def send_cash_update(self, cash_update: CashUpdate) -> bool:
-        """Send cash amount update to kiosk API"""
-        max_retries = config["retry_attempts"]
+        """Send cash amount update to kiosk API
         
-        for attempt in range(max_retries):
-            try:
-                url = f"{self.api_url}/api/cash-payment/update"
-                payload = {
-                    "orderNumber": cash_update.order_number,
-                    "amountAdded": cash_update.amount_added
-                }
-                
-                headers = {'Content-Type': 'application/json'}
-                if self.api_key:
-                    headers['X-API-Key'] = self.api_key
-                
-                logger.info(f"[CASH] Sending cash update: {payload} (Attempt {attempt + 1}/{max_retries})")
-                response = self.session.post(url, json=payload, headers=headers, timeout=config["connection_timeout_seconds"])
+        Retries with backoff for connection errors are handled by the session's
+        HTTPAdapter. If the VPS is still unreachable after that, VpsError is raised
+        so the caller can resend later; False means the VPS answered but rejected
+        the update, or took it without answering in time.
+        """
+        try:
+            url = self._update_url
+            payload = {
+                "orderNumber": cash_update.order_number,
+                "amountAdded": cash_update.amount_added
+            }
             
-                if response.status_code == 200:
-                    data = response.json()
-                    logger.info(f"[CASH] Cash update successful: {data}")
-                    
-                    # Check if payment is complete
-                    if data.get('isComplete'):
-                        logger.info(f"[CASH] Payment completed for order {cash_update.order_number}")
-                        self.current_order = None
-                        
-                    return True
-                else:
-                    logger.error(f"[CASH] Failed to send cash update: {response.status_code} - {response.text}")
-                    if attempt < max_retries - 1:
-                        time.sleep(2)
-                        continue
-                    return False
+            logger.info(f"[CASH] Sending cash update: {payload}")
+            response = self.session.post(url, data=json_dumps(payload), timeout=self._timeout)
+        
+            if response.status_code == 200:
+                data = json_loads(response.content)
+                logger.info(f"[CASH] Cash update successful: {data}")
+                
+                # Check if payment is complete
+                if data.get('isComplete'):
+                    logger.info(f"[CASH] Payment completed for order {cash_update.order_number}")
+                    with self._sessions_lock:
+                        if self.current_order == cash_update.order_number:
+                            self.current_order = None
                     
-            except Exception as e:
-                logger.error(f"[CASH] Error sending cash update (attempt {attempt + 1}/{max_retries}): {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(2)
-                    continue
+                return True
+            else:
+                logger.error(f"[CASH] Failed to send cash update: {response.status_code} - {body_excerpt(response)}")
                 return False
-        
-        return False
+                
+        except requests.exceptions.ConnectionError as e:
+            # Includes ConnectTimeout: the update never reached the VPS, so it is safe to resend
+            raise VpsError(f"Cannot reach VPS API at {url}: {e}") from e
+        except requests.exceptions.Timeout as e:
+            # Outcome unknown: the VPS may already have credited it, and resending
+            # could credit the customer twice
+            logger.error(f"[CASH] No answer to cash update for order {cash_update.order_number}, "
+                         f"not resending (it may have been applied): {e}")
+            return False
+        except Exception as e:
+            logger.error(f"[CASH] Error sending cash update: {e}")
+            return False
     
-    def parse_arduino_data(self, data: str) -> Optional[CashUpdate]:
-        """Parse data received from Arduino
+    def parse_arduino_data(self, data: bytes) -> Optional[CashUpdate]:
+        """Parse a raw line received from Arduino
         
         Expected format from Arduino:
         - "BILL:100" - ₱100 bill inserted
         - "COIN:5" - ₱5 coin inserted
         - "READY" - Arduino startup message
         - "PONG" - Response to PING command
+        - "PRINT:..." - Printer replies (forwarded to the printer client)
         - "# ..." - Comment/debug messages (ignored)
         
+        Lines stay as bytes and are dispatched on their 4-byte prefix.
+        
         Note: Order number is auto-selected from active sessions (no ORDER command needed)
         """
         try:
@@ -302,59 +516,86 @@ class ArduinoCashReader:
             if not data:
                 return None
             
-            # Ignore comment lines (Arduino debug/heartbeat messages)
-            if data.startswith("#"):
-                logger.debug(f"[CASH] Arduino info: {data}")
-                return None
-            
-            # Handle system messages
-            if data in ["READY", "PONG"]:
-                logger.info(f"[CASH] Arduino status: {data}")
-                return None
+            handler = self._FRAME_DISPATCH.get(data[:4])
+            if handler is not None:
+                return handler(self, data)
             
-            # Log all received data at debug level
-            logger.debug(f"[CASH] Received from Arduino: {data}")
-            
-            # Handle cash insertion - only process if we have an active order
-            if data.startswith("BILL:") or data.startswith("COIN:"):
-                if not self.current_order:
-                    logger.warning("[CASH] Received cash data but no active order session. Waiting for order from VPS...")
-                    return None
-                
-                amount = 0.0
-                
-                if data.startswith("BILL:"):
-                    amount = float(data.split(":", 1)[1])
-                    logger.info(f"[CASH] Bill inserted: ₱{amount} for order {self.current_order}")
-                    print(f"✓ Bill: ₱{amount} (Order: {self.current_order})")
-                elif data.startswith("COIN:"):
-                    amount = float(data.split(":", 1)[1])
-                    logger.info(f"[CASH] Coin inserted: ₱{amount} for order {self.current_order}")
-                    print(f"✓ Coin: ₱{amount} (Order: {self.current_order})")
-                
-                if amount > 0:
-                    return CashUpdate(
-                        order_number=self.current_order,
-                        amount_added=amount
-                    )
-            else:
-                # Unknown command - log but don't error
-                logger.debug(f"[CASH] Unhandled Arduino message: {data}")
+            # Ignore comment lines (Arduino debug/heartbeat messages)
+            if data[:1] == b'#':
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"[CASH] Arduino info: {data.decode('utf-8', errors='ignore')}")
                 return None
             
+            # Unknown command - log but don't error
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"[CASH] Unhandled Arduino message: {data!r}")
             return None
             
         except ValueError as e:
-            logger.error(f"[CASH] Error parsing amount from '{data}': {e}")
+            logger.error(f"[CASH] Error parsing amount from {data!r}: {e}")
             return None
         except Exception as e:
             logger.error(f"[CASH] Error parsing Arduino data: {e}")
             return None
     
+    def _on_cash(self, data: bytes) -> Optional[CashUpdate]:
+        """Handle "BILL:n" / "COIN:n" - only processed if we have an active order"""
+        if data[4:5] != b':':
+            logger.debug(f"[CASH] Unhandled Arduino message: {data!r}")
+            return None
+        
+        with self._sessions_lock:
+            order_number = self.current_order  # Consistent with the poller's last session swap
+        if not order_number:
+            # Cash fed in with no order repeats the frame per coin/bill; warn once per interval
+            now = time.monotonic()
+            if now - self._no_order_warned_at >= NO_ORDER_WARNING_INTERVAL:
+                self._no_order_warned_at = now
+                logger.warning("[CASH] Received cash data but no active order session. Waiting for order from VPS...")
+            else:
+                logger.debug(f"[CASH] Ignoring {data!r}: no active order session")
+            return None
+        
+        frame = CASH_FRAMES.get(data)
+        if frame is not None:
+            label, amount = frame
+        else:
+            # Unlisted amount (e.g. a TEST:BILL command or a reconfigured acceptor)
+            amount = float(data[5:])  # float() accepts ASCII bytes
+            if amount <= 0:
+                return None
+            label = CASH_FRAME_LABELS[data[:4]]
+        
+        logger.info(f"[CASH] {label} inserted: ₱{amount} for order {order_number}")
+        return CashUpdate(order_number=order_number, amount_added=amount)
+    
+    def _on_print_response(self, data: bytes) -> None:
+        """Printer replies belong to the printer client, which is waiting on them"""
+        if data.startswith(b'PRINT:'):
+            self.print_responses.put(data.decode('utf-8', errors='ignore'))
+        return None
+    
+    def _on_status(self, data: bytes) -> None:
+        """Handle system messages (READY, PONG)"""
+        if data in (b'READY', b'PONG'):
+            logger.info(f"[CASH] Arduino status: {data.decode()}")
+            if data == b'READY':
+                self.ready_event.set()
+        return None
+    
+    # Frame prefix -> handler, so each line costs one dict lookup
+    _FRAME_DISPATCH = {
+        b'BILL': _on_cash,
+        b'COIN': _on_cash,
+        b'PRIN': _on_print_response,
+        b'READ': _on_status,
+        b'PONG': _on_status,
+    }
+    
     def cancel_payment(self, order_number: str) -> bool:
         """Cancel payment for an order"""
         try:
-            url = f"{self.api_url}/api/cash-payment/cancel/{order_number}"
+            url = self._cancel_url_fmt.format(order_number)
             response = self.session.post(url, timeout=5)
             
             if response.status_code == 200:
@@ -368,52 +609,139 @@ class ArduinoCashReader:
             logger.error(f"[CASH] Error cancelling payment: {e}")
             return False
     
+    def _sessions_loop(self):
+        """Poll VPS for active payment sessions on a separate thread
+        
+        Keeps slow VPS responses from stalling serial reads. When the VPS supports
+        long-polling the next request goes out immediately; otherwise (or after an
+        error, e.g. a 404 from an older VPS) polls are spaced poll_interval apart.
+        """
+        while self.running:
+            current_time = time.monotonic()  # Immune to NTP/wall-clock jumps
+            ok = False
+            try:
+                ok = self.poll_active_sessions()
+                self.last_poll_time = current_time
+                
+                # Display current status
+                if self.active_sessions and self.current_order:
+                    session = self.active_sessions.get(self.current_order)
+                    if session:
+                        logger.debug(f"[CASH] Current order: {self.current_order} - "
+                                  f"₱{session['amountInserted']}/₱{session['totalRequired']}")
+            except Exception as e:
+                logger.error(f"[CASH] Unexpected error in session poll loop: {e}")
+            
+            if ok and self._cursor:
+                continue  # The VPS already waited for a change
+            
+            self._stop_event.wait(max(0.0, self.poll_interval - (time.monotonic() - current_time)))
+    
+    def _tx_worker(self):
+        """Send queued cash updates to the VPS on a separate thread
+        
+        Updates arriving within coalesce_window of each other are summed per order
+        and sent as a single POST, so a burst of coins costs one round-trip.
+        
+        Updates that could not reach the VPS are put back on the queue after an
+        exponentially growing, jittered delay, so inserted cash is never dropped
+        during an outage.
+        """
+        retry_delay = self._base_reconnect_delay
+        
+        while True:
+            batch = [self._tx_queue.get()]
+            
+            # Give the rest of a coin burst time to arrive, then drain it
+            time.sleep(self.coalesce_window)
+            while True:
+                try:
+                    batch.append(self._tx_queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            totals = {}
+            for cash_update in batch:
+                totals[cash_update.order_number] = totals.get(cash_update.order_number, 0) + cash_update.amount_added
+            
+            if len(batch) > len(totals):
+                logger.info(f"[CASH] Coalesced {len(batch)} cash events into {len(totals)} update(s)")
+            
+            unsent = []
+            for order_number, amount in totals.items():
+                cash_update = CashUpdate(order_number=order_number, amount_added=amount)
+                try:
+                    self.send_cash_update(cash_update)
+                except VpsError as e:
+                    logger.error(f"[CASH] Cash update for order {order_number} not delivered: {e}")
+                    unsent.append(cash_update)
+                except Exception as e:
+                    logger.error(f"[CASH] Unexpected error sending cash update: {e}")
+            
+            if unsent:
+                # Jitter keeps a fleet of kiosks from retrying in lockstep after a VPS restart
+                delay = retry_delay + random.uniform(0, 0.5)
+                logger.warning(f"[CASH] Resending {len(unsent)} cash update(s) in {delay:.1f} seconds")
+                time.sleep(delay)
+                retry_delay = min(retry_delay * 2, self._max_reconnect_delay)
+                for cash_update in unsent:
+                    self._tx_queue.put(cash_update)
+            else:
+                retry_delay = self._base_reconnect_delay
+            
+            for _ in batch:
+                self._tx_queue.task_done()
+    
     def run(self):
-        """Main loop to read Arduino data and send updates"""
+        """Main loop to read Arduino data and queue updates for the VPS"""
         logger.info("[CASH] Starting cash reader loop...")
         self.running = True
+        self._stop_event.clear()
+        threading.Thread(target=self._sessions_loop, name="CashSessionPoller", daemon=True).start()
+        threading.Thread(target=self._tx_worker, name="CashSender", daemon=True).start()
         
         while self.running:
             try:
-                # Poll VPS for active payment sessions periodically
-                current_time = time.time()
-                if current_time - self.last_poll_time >= self.poll_interval:
-                    self.poll_active_sessions()
-                    self.last_poll_time = current_time
-                    
-                    # Display current status
-                    if self.active_sessions and self.current_order:
-                        session = self.active_sessions.get(self.current_order)
-                        if session:
-                            logger.debug(f"[CASH] Current order: {self.current_order} - "
-                                      f"₱{session['amountInserted']}/₱{session['totalRequired']}")
-                
                 # Connect to Arduino if not connected
                 if not self.serial_connection or not self.serial_connection.is_open:
                     if not self.connect_arduino():
-                        time.sleep(config["reconnect_delay_seconds"])
+                        self.wait_before_reconnect()
                         continue
                 
-                # Read line from Arduino
-                if self.serial_connection.in_waiting > 0:
-                    line = self.serial_connection.readline().decode('utf-8', errors='ignore')
-                    
+                # Sleep in the kernel until bytes arrive (or stop() wakes us) instead of
+                # waking on a timer; an unplugged port also reports readable and fails the read
+                if self._sel_key:
+                    ready = self._sel.select()
+                    if not any(key.fd == self._sel_key.fd for key, _ in ready):
+                        self._wake_r.recv(64)
+                        continue
+                
+                # Take everything the driver has buffered in one read; fall back to a
+                # blocking readline() when nothing is queued (or the port isn't selectable)
+                waiting = self.serial_connection.in_waiting
+                chunk = self.serial_connection.read(waiting) if waiting else self.serial_connection.readline()
+                if not chunk:
+                    continue
+                
+                # The last piece is an incomplete line (or b''); keep it until its newline arrives
+                *lines, self._partial_line = (self._partial_line + chunk).split(b'\n')
+                
+                for line in lines:
                     # Parse and process the data
                     cash_update = self.parse_arduino_data(line)
                     
                     if cash_update:
-                        self.send_cash_update(cash_update)
-                
-                time.sleep(0.1)
+                        # Hand off to the sender thread
+                        self._tx_queue.put(cash_update)
                 
             except serial.SerialException as e:
                 logger.error(f"[CASH] Serial communication error: {e}")
                 self.disconnect_arduino()
-                time.sleep(config["reconnect_delay_seconds"])
+                self.wait_before_reconnect()
                 
             except Exception as e:
                 logger.error(f"[CASH] Unexpected error in read loop: {e}")
-                time.sleep(1)
+                self._stop_event.wait(1)
         
         self.disconnect_arduino()
         logger.info("[CASH] Cash reader stopped")
@@ -423,34 +751,120 @@ class ArduinoCashReader:
 # RECEIPT PRINTER MODULE
 # ============================================================================
 
+RECEIPT_WIDTH = 28  # Characters per line on the 58mm printer
+
+
+class _AsciiTable(dict):
+    """str.translate table mapping non-ASCII code points to '?', filled on demand"""
+    
+    def __missing__(self, codepoint: int):
+        self[codepoint] = value = codepoint if codepoint < 128 else '?'
+        return value
+
+
+_ASCII_TABLE = _AsciiTable()
+
+
+@functools.lru_cache(maxsize=256)
+def _safe(text: str) -> str:
+    """Convert text to ASCII, replacing non-ASCII characters with '?' (cached)"""
+    return text if text.isascii() else text.translate(_ASCII_TABLE)
+
+
+@functools.lru_cache(maxsize=64)
+def _center(text: str, width: int) -> str:
+    """Manually center text to avoid encoding issues (cached)"""
+    text = text.strip()
+    if len(text) >= width:
+        return text[:width]
+    
+    total_padding = width - len(text)
+    left_padding = total_padding // 2
+    right_padding = total_padding - left_padding
+    
+    return (' ' * left_padding) + text + (' ' * right_padding)
+
+
+# Arduino Serial buffer is 64 bytes by default; be very conservative - max 50 per command
+ARDUINO_MAX_COMMAND = 50
+
+# Receipt bytes per PRINT:BLOB chunk; must match PRINT_BLOB_CHUNK in the Arduino sketch
+PRINT_BLOB_CHUNK = 60
+
+# Item and money lines, each 27 characters wide
+RECEIPT_ITEM_TMPL = "{:<16.16} {:>3}{:>8.2f}"
+RECEIPT_SUBTOTAL_TMPL = "Subtotal:{:>18.2f}"
+RECEIPT_VAT_TMPL = "VAT:{:>23.2f}"
+RECEIPT_TOTAL_TMPL = "TOTAL:{:>21.2f}"
+RECEIPT_PAID_TMPL = "Paid:{:>22.2f}"
+RECEIPT_CHANGE_TMPL = "Change:{:>20.2f}"
+
+# Footer is the same on every receipt
+RECEIPT_FOOTER_LINES = (
+    _center('THANK YOU!', RECEIPT_WIDTH),
+    _center('Please come again', RECEIPT_WIDTH),
+    '',
+    _center('Have a great day!', RECEIPT_WIDTH),
+    '',
+    '',
+    '',
+)
+
+
 class ReceiptPrinterClient:
     """Client that polls VPS for print jobs and sends to Arduino for printing"""
     
-    def __init__(self, vps_url: str, arduino_serial_connection=None):
+    def __init__(self, vps_url: str, arduino_serial_connection=None,
+                 print_responses: Optional[queue.Queue] = None,
+                 session: Optional[requests.Session] = None):
         self.vps_url = vps_url
+        self._next_job_url = f"{vps_url}/api/receipt/queue/next"
+        self._complete_url_fmt = f"{vps_url}/api/receipt/queue/complete/{{}}"
+        self._failed_url_fmt = f"{vps_url}/api/receipt/queue/failed/{{}}"
+        if arduino_serial_connection is not None and not isinstance(arduino_serial_connection, SharedSerial):
+            # A plain port passed in directly still gets locked writes
+            shared_port = SharedSerial()
+            shared_port.attach(arduino_serial_connection)
+            arduino_serial_connection = shared_port
         self.arduino_connection = arduino_serial_connection
-        self.session = requests.Session()
+        # PRINT:* replies forwarded by the cash reader (the only thread reading the port)
+        self.print_responses = print_responses
+        self.ack_timeout: float = 2.0  # Seconds to wait for PRINT:ACK before falling back to timed pacing
+        self.long_poll_seconds: int = config["printer_long_poll_seconds"]
+        self.blob_supported: Optional[bool] = None  # Whether the firmware accepts PRINT:BLOB (None = not tried yet)
+        self._jobs: queue.Queue = queue.Queue()  # Next job, fetched while the current one prints
+        self._results: queue.Queue = queue.Queue()  # (job_id, error or None) waiting to be reported to the VPS
+        self._printed: "OrderedDict[str, None]" = OrderedDict()  # Recently printed job IDs, oldest first
+        # Sharing the cash reader's session lets both clients draw on one pool of warm connections
+        self.session = session or create_session()
         self.running = False
+        self._stop_event = threading.Event()  # Cuts short the job poller's waits on shutdown
         self.use_arduino_printer = True  # Set to False to use direct printer connection
+        self._header_key: Optional[Tuple[str, str, str]] = None  # (name, address, phone) of cached header
+        self._header_lines: Tuple[str, ...] = ()
         
     
     def _safe_text(self, text: str) -> str:
         """Convert text to safe ASCII-only format"""
         try:
-            # Convert to ASCII, replacing non-ASCII characters with '?'
-            return text.encode('ascii', errors='replace').decode('ascii')
+            return _safe(text)
         except Exception as e:
             logger.warning(f"[PRINTER] Error converting text to ASCII: {e}")
             return text
     
     def check_for_print_jobs(self) -> Optional[Dict[str, Any]]:
-        """Poll VPS for pending print jobs"""
+        """Poll VPS for pending print jobs
+        
+        Long-polls: with an empty queue the VPS holds the request for up to
+        long_poll_seconds and answers as soon as a job is queued.
+        """
         try:
-            url = f"{self.vps_url}/api/receipt/queue/next"
-            response = self.session.get(url, timeout=5)
+            url = self._next_job_url
+            params = {'wait': self.long_poll_seconds} if self.long_poll_seconds > 0 else None
+            response = self.session.get(url, params=params, timeout=5 + self.long_poll_seconds)
             
             if response.status_code == 200:
-                data = response.json()
+                data = json_loads(response.content)
                 if data.get('hasPrintJob'):
                     return data
             elif response.status_code == 204:
@@ -464,7 +878,13 @@ class ReceiptPrinterClient:
         return None
     
     def print_receipt(self, receipt_data: Dict[str, Any]) -> bool:
-        """Print a receipt via Arduino with slow, controlled transmission"""
+        """Print a receipt via Arduino
+        
+        Each command waits for the firmware's PRINT:ACK before the next is sent;
+        older firmware without ACKs falls back to fixed per-line delays. The
+        receipt body goes out as one PRINT:BLOB when the firmware supports it,
+        otherwise one PRINT:LINE per line.
+        """
         try:
             order_number = receipt_data.get('orderNumber', 'N/A')
             logger.info(f"[PRINTER] Printing receipt via Arduino for order: {order_number}")
@@ -473,51 +893,81 @@ class ReceiptPrinterClient:
                 logger.error("[PRINTER] Arduino not connected")
                 return False
             
-            # Clear any pending data in serial buffer
-            self.arduino_connection.reset_input_buffer()
-            self.arduino_connection.reset_output_buffer()
+            # Drop stale PRINT:* replies. The serial input buffer is left alone: the
+            # cash reader owns it, and resetting it would discard BILL/COIN lines.
+            self._drain_print_responses()
             
-            # Start print job
+            # Start print job; firmware with flow control answers PRINT:ACK once the printer is ready
             logger.info(f"[PRINTER] Starting print job for order {order_number}")
+            started = time.monotonic()
             self._send_arduino_command("PRINT:START")
-            time.sleep(1.0)  # Give Arduino plenty of time to initialize printer
+            reply = self._wait_for_print_response(self.ack_timeout)
             
-            # Send receipt content line by line with significant delay
+            if reply and reply.startswith("PRINT:ERROR"):
+                logger.error(f"[PRINTER] Arduino refused print job: {reply}")
+                return False
+            
+            acked = reply == "PRINT:ACK"
+            if not acked:
+                logger.warning("[PRINTER] No PRINT:ACK from Arduino - using timed pacing")
+                # Give Arduino plenty of time to initialize printer
+                time.sleep(max(0.0, 1.0 - (time.monotonic() - started)))
+            
+            # Send receipt content
             lines = self._generate_receipt_lines(receipt_data)
             total_lines = len(lines)
             
             logger.info(f"[PRINTER] Generated {total_lines} receipt lines total")
             
-            for i, line in enumerate(lines):
-                # Build the full command that will be sent
-                full_command = f"PRINT:LINE:{line}"
-                command_length = len(full_command)
-                
-                # Log every line with full command details
-                print(f"[PRINTER] Sending line {i+1}/{total_lines}: ({command_length} bytes) '{full_command}'")
-                logger.info(f"[PRINTER] >>> Line {i+1}/{total_lines} ({command_length} bytes): '{full_command}'")
-                
-                # Check if command is safe before sending
-                if command_length > 63:
-                    logger.error(f"[PRINTER] ⚠️ BUFFER OVERFLOW RISK! Command is {command_length} bytes (max 64)")
-                
-                self._send_arduino_command(f"PRINT:LINE:{line}")
-                
-                # Much slower transmission with longer delays
-                # Arduino needs time to process and print each line
-                line_length = len(line)
-                if line_length > 30:
-                    time.sleep(0.4)  # Long lines need much more time
-                elif line_length > 0:
-                    time.sleep(0.3)  # Normal lines - be very conservative
-                else:
-                    time.sleep(0.1)  # Empty lines
+            # Firmware with PRINT:BLOB support takes the whole body in a few chunks
+            if acked and self.blob_supported is not False and self._send_receipt_blob(lines):
+                logger.info(f"[PRINTER] Sent {total_lines} lines as one PRINT:BLOB")
+            else:
+                log_lines = logger.isEnabledFor(logging.INFO)
+                for i, line in enumerate(lines):
+                    # Build the full command that will be sent
+                    full_command = f"PRINT:LINE:{line}"
+                    
+                    # Log every line with full command details
+                    if log_lines:
+                        logger.info(f"[PRINTER] >>> Line {i+1}/{total_lines} ({len(full_command)} bytes): '{full_command}'")
+                    
+                    self._send_arduino_command(full_command, paced=not acked)
+                    
+                    # Back-pressure: the next line goes out as soon as Arduino has printed this one
+                    if acked:
+                        reply = self._wait_for_print_response(self.ack_timeout)
+                        if reply == "PRINT:ACK":
+                            continue
+                        logger.warning(f"[PRINTER] No PRINT:ACK for line {i+1} ({reply}) - switching to timed pacing")
+                        acked = False
+                    
+                    # Timed pacing for firmware without PRINT:ACK
+                    # Arduino needs time to process and print each line
+                    line_length = len(line)
+                    if line_length > 30:
+                        time.sleep(0.4)  # Long lines need much more time
+                    elif line_length > 0:
+                        time.sleep(0.3)  # Normal lines - be very conservative
+                    else:
+                        time.sleep(0.1)  # Empty lines
             
             # End print job (cut paper)
             logger.info(f"[PRINTER] All {total_lines} lines sent, cutting paper...")
-            time.sleep(0.5)  # Extra delay before cut command
-            self._send_arduino_command("PRINT:END")
-            time.sleep(3)  # Wait even longer for paper feed and cut
+            if not acked:
+                time.sleep(0.5)  # Extra delay before cut command
+            self._send_arduino_command("PRINT:END", paced=not acked)
+            
+            if acked:
+                # Arduino answers PRINT:OK once paper is fed and cut
+                reply = self._wait_for_print_response(5.0)
+                if reply and reply.startswith("PRINT:ERROR"):
+                    logger.error(f"[PRINTER] Arduino reported print failure: {reply}")
+                    return False
+                if reply != "PRINT:OK":
+                    logger.warning(f"[PRINTER] No PRINT:OK after cut ({reply})")
+            else:
+                time.sleep(3)  # Wait even longer for paper feed and cut
             
             logger.info(f"[PRINTER] Receipt printed successfully for order: {order_number}")
             return True
@@ -526,39 +976,86 @@ class ReceiptPrinterClient:
             logger.error(f"[PRINTER] Error printing receipt: {e}")
             return False
     
-    def _send_arduino_command(self, command: str):
-        """Send command to Arduino with strict length check"""
+    def _send_receipt_blob(self, lines: list) -> bool:
+        """Send the receipt body as "PRINT:BLOB:<len>" followed by the raw lines
+        
+        The payload goes out in PRINT_BLOB_CHUNK-byte pieces, each acked by the
+        Arduino, so its 64-byte receive buffer never overflows. Returns False if
+        the firmware doesn't know PRINT:BLOB; nothing has been printed then.
+        """
+        payload = ''.join(f"{line}\n" for line in lines).encode('ascii', errors='replace')
+        self._send_arduino_command(f"PRINT:BLOB:{len(payload)}", paced=False)
+        reply = self._wait_for_print_response(self.ack_timeout)
+        
+        if reply and reply.startswith("PRINT:ERROR"):
+            raise RuntimeError(f"Arduino refused receipt body: {reply}")
+        if reply != "PRINT:ACK":
+            logger.warning(f"[PRINTER] No PRINT:BLOB support in Arduino firmware ({reply}) - sending line by line")
+            self.blob_supported = False
+            return False
+        self.blob_supported = True
+        
+        # Hold the port for the whole payload so no other command lands inside it
+        with self.arduino_connection.lock:
+            for offset in range(0, len(payload), PRINT_BLOB_CHUNK):
+                self.arduino_connection.write(payload[offset:offset + PRINT_BLOB_CHUNK])
+                reply = self._wait_for_print_response(self.ack_timeout)
+                if reply != "PRINT:ACK":
+                    raise RuntimeError(f"No PRINT:ACK for receipt bytes {offset}-{offset + PRINT_BLOB_CHUNK} ({reply})")
+        return True
+    
+    def _drain_print_responses(self):
+        """Discard PRINT:* replies left over from a previous job"""
+        if self.print_responses is None:
+            return
+        while True:
+            try:
+                self.print_responses.get_nowait()
+            except queue.Empty:
+                return
+    
+    def _wait_for_print_response(self, timeout: float) -> Optional[str]:
+        """Wait for the next PRINT:* reply from Arduino; None on timeout"""
+        if self.print_responses is None:
+            return None
+        try:
+            return self.print_responses.get(timeout=timeout)
+        except queue.Empty:
+            return None
+    
+    def _send_arduino_command(self, command: str, paced: bool = True):
+        """Send command to Arduino with strict length check
+        
+        paced=False skips the drain and settle delay, for commands whose
+        PRINT:ACK/PRINT:OK reply is awaited anyway.
+        """
         if self.arduino_connection and self.arduino_connection.is_open:
-            # Arduino Serial buffer is 64 bytes by default
-            # Be very conservative - max 50 chars to be safe
-            if len(command) > 50:
-                logger.error(f"[PRINTER] Command TOO LONG ({len(command)} chars)! Line: '{command}'")
-                logger.error(f"[PRINTER] Truncating to 50 chars...")
-                command = command[:50]
+            # Encode once; the length check and the write both use these bytes
+            buf = command.encode('ascii', errors='replace')
+            if len(buf) > ARDUINO_MAX_COMMAND:
+                logger.error(f"[PRINTER] Command TOO LONG ({len(buf)} bytes)! Line: '{command}'")
+                logger.error(f"[PRINTER] Truncating to {ARDUINO_MAX_COMMAND} bytes...")
+                buf = buf[:ARDUINO_MAX_COMMAND]
             
             # Log what we're actually sending
-            logger.debug(f"[PRINTER] Sending ({len(command)} chars): {command}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"[PRINTER] Sending ({len(buf)} bytes): {buf!r}")
             
-            self.arduino_connection.write(f"{command}\n".encode('utf-8'))
-            self.arduino_connection.flush()
-            time.sleep(0.02)  # Small delay after flushing
+            self.arduino_connection.write(buf + b'\n')
+            if paced:
+                self.arduino_connection.flush()
+                time.sleep(0.02)  # Small delay after flushing
     
     def _generate_receipt_lines(self, data: Dict[str, Any]) -> list:
         """Generate receipt lines - NO SEPARATOR LINES to avoid printer issues"""
         lines = []
         
-        # Header - Centered
-        name = self._safe_text(data.get('restaurantName', 'Restaurant'))
-        address = self._safe_text(data.get('restaurantAddress', ''))
-        phone = self._safe_text(data.get('restaurantPhone', ''))
-        
-        lines.append(self._center_text(name, 28))
-        if address:
-            lines.append(self._center_text(address, 28))
-        if phone:
-            lines.append(self._center_text(phone, 28))
-        lines.append('')
-        lines.append('')
+        # Header - Centered (rebuilt only when the restaurant details change)
+        lines.extend(self._header(
+            data.get('restaurantName', 'Restaurant'),
+            data.get('restaurantAddress', ''),
+            data.get('restaurantPhone', '')
+        ))
         
         # Order details
         order_num = self._safe_text(data.get('orderNumber', 'N/A'))[:20]
@@ -581,26 +1078,21 @@ class ReceiptPrinterClient:
         # Items - Build each item line
         items_list = data.get('items', [])
         logger.info(f"[PRINTER] Processing {len(items_list)} items for receipt")
+        log_items = logger.isEnabledFor(logging.INFO)
+        
+        format_item = RECEIPT_ITEM_TMPL.format
         
         for idx, item in enumerate(items_list):
-            item_name = self._safe_text(item.get('productName', 'Unknown'))
-            qty = item.get('quantity', 0)
-            price = item.get('lineTotal', 0.0)
-            
-            # Truncate and pad name to 16 chars
-            if len(item_name) > 16:
-                item_name = item_name[:16]
-            item_name = item_name.ljust(16)
-            
-            # Format numbers
-            qty_str = str(qty).rjust(3)
-            price_str = f'{price:.2f}'.rjust(8)
+            # Name truncated/padded to 16, qty to 3, price to 8 (27 chars total),
+            # all inside one format call
+            lines.append(format_item(
+                _safe(item.get('productName', 'Unknown')),
+                item.get('quantity', 0),
+                item.get('lineTotal', 0.0)
+            ))
             
-            # Build line (27 chars total)
-            item_line = item_name + ' ' + qty_str + price_str
-            
-            logger.info(f"[PRINTER] Item {idx+1} line: '{item_line}'")
-            lines.append(item_line)
+            if log_items:
+                logger.info(f"[PRINTER] Item {idx+1} line: '{lines[-1]}'")
         
         lines.append('')
         lines.append('')
@@ -610,13 +1102,13 @@ class ReceiptPrinterClient:
         tax = data.get('tax', 0)
         total = data.get('totalAmount', 0)
         
-        lines.append('Subtotal:' + f'{subtotal:.2f}'.rjust(18))
+        lines.append(RECEIPT_SUBTOTAL_TMPL.format(subtotal))
         
         if tax > 0:
-            lines.append('VAT:' + f'{tax:.2f}'.rjust(23))
+            lines.append(RECEIPT_VAT_TMPL.format(tax))
         
         lines.append('')
-        lines.append('TOTAL:' + f'{total:.2f}'.rjust(21))
+        lines.append(RECEIPT_TOTAL_TMPL.format(total))
         lines.append('')
         lines.append('')
         
@@ -627,49 +1119,44 @@ class ReceiptPrinterClient:
         
         if data.get('amountPaid'):
             amount_paid = data['amountPaid']
-            lines.append('Paid:' + f'{amount_paid:.2f}'.rjust(22))
+            lines.append(RECEIPT_PAID_TMPL.format(amount_paid))
             
             change = data.get('change', 0)
             if change > 0:
-                lines.append('Change:' + f'{change:.2f}'.rjust(20))
+                lines.append(RECEIPT_CHANGE_TMPL.format(change))
         
         lines.append('')
         lines.append('')
         
         # Footer - Centered
-        lines.append(self._center_text('THANK YOU!', 28))
-        lines.append(self._center_text('Please come again', 28))
-        lines.append('')
-        lines.append(self._center_text('Have a great day!', 28))
-        lines.append('')
-        lines.append('')
-        lines.append('')
+        lines.extend(RECEIPT_FOOTER_LINES)
         
         return lines
     
+    def _header(self, name: str, address: str, phone: str) -> Tuple[str, ...]:
+        """Centered restaurant header, cached until the restaurant details change"""
+        key = (name, address, phone)
+        if key != self._header_key:
+            lines = [self._center_text(self._safe_text(name), RECEIPT_WIDTH)]
+            if address:
+                lines.append(self._center_text(self._safe_text(address), RECEIPT_WIDTH))
+            if phone:
+                lines.append(self._center_text(self._safe_text(phone), RECEIPT_WIDTH))
+            lines.append('')
+            lines.append('')
+            self._header_lines = tuple(lines)
+            self._header_key = key
+        return self._header_lines
+    
     def _center_text(self, text: str, width: int) -> str:
         """Manually center text to avoid encoding issues"""
-        text = text.strip()
-        if len(text) >= width:
-            return text[:width]
-        
-        total_padding = width - len(text)
-        left_padding = total_padding // 2
-        right_padding = total_padding - left_padding
-        
-        result = (' ' * left_padding) + text + (' ' * right_padding)
-        
-        # Safety check - ensure we don't exceed width
-        if len(result) > width:
-            result = result[:width]
-        
-        return result
+        return _center(text, width)
     
     
     def mark_job_completed(self, job_id: str) -> bool:
         """Notify VPS that print job is completed"""
         try:
-            url = f"{self.vps_url}/api/receipt/queue/complete/{job_id}"
+            url = self._complete_url_fmt.format(job_id)
             response = self.session.post(url, timeout=5)
             return response.status_code == 200
         except Exception as e:
@@ -679,51 +1166,113 @@ class ReceiptPrinterClient:
     def mark_job_failed(self, job_id: str, error: str) -> bool:
         """Notify VPS that print job failed"""
         try:
-            url = f"{self.vps_url}/api/receipt/queue/failed/{job_id}"
-            response = self.session.post(url, json={"error": error}, timeout=5)
+            url = self._failed_url_fmt.format(job_id)
+            response = self.session.post(url, data=json_dumps({"error": error}), timeout=5)
             return response.status_code == 200
         except Exception as e:
             logger.error(f"[PRINTER] Error marking job failed: {e}")
             return False
     
-    def run(self):
-        """Main loop - poll for print jobs"""
-        logger.info("[PRINTER] Starting receipt printer loop (Arduino mode)...")
-        self.running = True
+    def _notify_loop(self):
+        """Report finished jobs to the VPS on a separate thread
+        
+        The completion POST overlaps printing of the next receipt instead of
+        holding it up for a round-trip. A None item ends the loop.
+        """
+        while True:
+            result = self._results.get()
+            if result is None:
+                break
+            job_id, error = result
+            if error is None:
+                self.mark_job_completed(job_id)
+            else:
+                self.mark_job_failed(job_id, error)
+    
+    def _poll_loop(self):
+        """Fetch print jobs on a separate thread so polling overlaps printing
         
+        At most one fetched job waits here while another prints; the rest stay
+        queued on the VPS.
+        """
         poll_interval = config["printer_poll_interval"]
+        started = time.monotonic()
         
         while self.running:
             try:
                 # Wait for Arduino connection to be available
                 if not self.arduino_connection or not self.arduino_connection.is_open:
-                    time.sleep(1)
+                    self._stop_event.wait(1)
                     continue
                 
                 # Check for print jobs
+                started = time.monotonic()
                 job_data = self.check_for_print_jobs()
                 
                 if job_data:
-                    job_id = job_data.get('jobId')
-                    receipt_data = job_data.get('receipt')
-                    
-                    logger.info(f"[PRINTER] Received print job: {job_id}")
-                    
-                    # Print receipt via Arduino
-                    success = self.print_receipt(receipt_data)
-                    
-                    # Notify VPS
-                    if success:
-                        self.mark_job_completed(job_id)
-                    else:
-                        self.mark_job_failed(job_id, "Printing failed")
+                    # Hand over and wait until the printer loop has taken it
+                    self._jobs.put(job_data)
+                    self._jobs.join()
+                    continue  # Fetch the next job while this one prints
+                
+            except Exception as e:
+                logger.error(f"[PRINTER] Error polling for print jobs: {e}")
+            
+            # Next poll is due poll_interval after this one started, however long the
+            # request took; a late poll (e.g. a long-poll that timed out empty) goes
+            # out at once instead of catching up
+            self._stop_event.wait(max(0.0, poll_interval - (time.monotonic() - started)))
+    
+    def stop(self):
+        """Ask run() and the job poller to exit, waking both from their waits"""
+        self.running = False
+        self._stop_event.set()
+        self._jobs.put(None)  # Wakes run() from its blocking get()
+    
+    def run(self):
+        """Main loop - print jobs fetched by the poller thread"""
+        logger.info("[PRINTER] Starting receipt printer loop (Arduino mode)...")
+        self.running = True
+        self._stop_event.clear()
+        threading.Thread(target=self._poll_loop, name="PrintJobPoller", daemon=True).start()
+        notifier = threading.Thread(target=self._notify_loop, name="PrintJobNotifier", daemon=True)
+        notifier.start()
+        
+        while self.running:
+            job_data = self._jobs.get()
+            self._jobs.task_done()  # Lets the poller fetch the next job while this one prints
+            if job_data is None:
+                continue  # Woken by stop()
+            
+            try:
+                job_id = job_data.get('jobId')
+                receipt_data = job_data.get('receipt')
+                
+                logger.info(f"[PRINTER] Received print job: {job_id}")
+                
+                if job_id in self._printed:
+                    # Already printed; its completion never reached the VPS, so report it again
+                    logger.warning(f"[PRINTER] Job {job_id} was already printed, acknowledging again")
+                    self._results.put((job_id, None))
+                    continue
+                
+                # Print receipt via Arduino
+                success = self.print_receipt(receipt_data)
+                
+                if success:
+                    self._printed[job_id] = None
+                    if len(self._printed) > PRINTED_JOB_HISTORY:
+                        self._printed.popitem(last=False)
                 
-                time.sleep(poll_interval)
+                # Notify VPS in the background
+                self._results.put((job_id, None if success else "Printing failed"))
                 
             except Exception as e:
                 logger.error(f"[PRINTER] Error in main loop: {e}")
-                time.sleep(poll_interval)
         
+        # Let results still in flight reach the VPS before shutting down
+        self._results.put(None)
+        notifier.join(timeout=10)
         logger.info("[PRINTER] Receipt printer stopped")
 
 
@@ -755,6 +1304,7 @@ def main():
             logger.info(f"  - Arduino Port: {config['arduino_port']}")
             logger.info(f"  - Baud Rate: {config['arduino_baud_rate']}")
             logger.info(f"  - Poll Interval: {config['cash_poll_interval']}s")
+            logger.info(f"  - Long-Poll Wait: {config['cash_long_poll_seconds']}s")
             logger.info("")
             
             cash_reader = ArduinoCashReader(
@@ -769,8 +1319,9 @@ def main():
             threads.append((cash_thread, cash_reader))
             logger.info("[CASH] Cash reader thread started")
             
-            # Give Arduino time to connect
-            time.sleep(3)
+            # Start the printer once the Arduino has connected and booted
+            if not cash_reader.ready_event.wait(timeout=10):
+                logger.warning("[CASH] No READY from Arduino yet - starting printer anyway")
         
         # Start printer thread (shares Arduino connection)
         if config["enable_printer"] and cash_reader:
@@ -778,12 +1329,15 @@ def main():
             logger.info(f"  - Mode: Arduino Serial (shared connection)")
             logger.info(f"  - Arduino Port: {config['arduino_port']}")
             logger.info(f"  - Poll Interval: {config['printer_poll_interval']}s")
+            logger.info(f"  - Long-Poll Wait: {config['printer_long_poll_seconds']}s")
             logger.info("")
             
             # Share the Arduino serial connection
             printer_client = ReceiptPrinterClient(
                 config["vps_api_url"],
-                arduino_serial_connection=cash_reader.serial_connection
+                arduino_serial_connection=cash_reader.shared_port,
+                print_responses=cash_reader.print_responses,
+                session=cash_reader.session
             )
             
             printer_thread = threading.Thread(target=printer_client.run, name="PrinterClient", daemon=False)
@@ -807,7 +1361,7 @@ def main():
         # Stop all modules
         for thread, module in threads:
             logger.info(f"Stopping {thread.name}...")
-            module.running = False
+            module.stop()
         
         # Wait for threads to finish
         for thread, _ in threads:
@@ -819,6 +1373,7 @@ def main():
         logger.error(f"Fatal error: {e}", exc_info=True)
     finally:
         logger.info("Peripherals manager stopped")
+        log_listener.stop()  # Flushes queued records before exit
 
 
 if __name__ == "__main__":
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Shared ESC/POS receipt pieces for the Restaurant Kiosk printer scripts
+Used by receipt_printer.py (local print API) and receipt_printer_client.py (VPS polling client)
+
+Fixed lines and control sequences are pre-encoded once, and the footer and QR
+codes are rendered once and cached as raw bytes for printer._raw().
+"""
+
+import functools
+from escpos.printer import Dummy
+from escpos.constants import ESC, HW_INIT, PAPER_FULL_CUT
+
+# Receipt item row: name, quantity, line total (32 columns)
+ITEM_LINE_FMT = "{:<20} {:>4} {:>7.2f}\n"
+
+# Fixed ASCII receipt lines, pre-encoded and written with _raw() (ASCII is the same in every codepage)
+SEPARATOR_LINE = b'-' * 32 + b'\n'
+DOUBLE_SEPARATOR_LINE = b'=' * 32 + b'\n'
+ITEMS_HEADER = f"{'Item':<20} {'Qty':>4} {'Amount':>7}\n".encode('ascii') + SEPARATOR_LINE
+
+# Printer reset and the bytes escpos's cut() sends (feed 6 lines, full cut)
+PRINTER_INIT = HW_INIT
+RECEIPT_CUT = ESC + b'd\x06' + PAPER_FULL_CUT
+
+
+@functools.lru_cache(maxsize=1)
+def render_footer() -> bytes:
+    """ESC/POS bytes for the fixed "Thank You" block of the receipt footer"""
+    footer = Dummy()
+    footer.set(align='center', bold=False)
+    
+    footer._raw(DOUBLE_SEPARATOR_LINE)
+    footer.text('\n')
+    
+    # Thank you message
+    footer.set(bold=True)
+    footer.text('Thank You!\n')
+    footer.set(bold=False)
+    footer.text('Please come again\n')
+    footer.text('\n')
+    return footer.output
+
+
+@functools.lru_cache(maxsize=64)
+def render_qr(qr_data: str, size: int) -> bytes:
+    """ESC/POS bytes for a QR code
+    
+    Rendering a QR goes through qrcode and an image conversion, the heaviest step
+    of a receipt; receipts that share a QR (e.g. a restaurant URL) reuse the bytes.
+    """
+    qr = Dummy()
+    qr.qr(qr_data, size=size)
+    return qr.output
@@ -4,15 +4,27 @@ Receipt Printer API for Restaurant Kiosk
 Handles thermal receipt printing via ESC/POS protocol on Raspberry Pi
 """
 
-import requests
-import time
-import json
+import functools
+import queue
+import threading
 import logging
+import uuid
+from collections import OrderedDict
 from typing import Optional, Dict, Any
 from datetime import datetime
 from flask import Flask, request, jsonify
-from escpos.printer import Usb, Network, Serial, File
+from flask.json.provider import DefaultJSONProvider
+import serial
+from escpos.printer import Usb, Network, Serial, File, Dummy
 from escpos.exceptions import USBNotFoundError, Error as ESCPOSError
+from receipt_escpos import (ITEM_LINE_FMT, SEPARATOR_LINE, DOUBLE_SEPARATOR_LINE, ITEMS_HEADER,
+                            PRINTER_INIT, RECEIPT_CUT, render_footer, render_qr)
+
+# orjson is optional; stock Pi images fall back to Flask's stdlib json provider
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Configuration
 # Printer Model: SHK24 (58mm thermal printer)
@@ -38,8 +50,13 @@ FILE_PATH = "/tmp/receipt.txt"
 FLASK_HOST = "0.0.0.0"
 FLASK_PORT = 5001
 
-# Setup logging
+# Print queue configuration
+PRINT_QUEUE_SIZE = 100  # Receipts waiting for the printer before /print answers 503
+JOB_HISTORY_SIZE = 200  # Recent jobs whose status /job/<id> can report
+
+# Setup logging (force: python-escpos already called logging.basicConfig() on import)
 logging.basicConfig(
+    force=True,
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
@@ -49,8 +66,56 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson
+    
+    jsonify() and request.get_json() go through app.json, so every endpoint
+    gets the faster parser/serializer without changes.
+    """
+    
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj, default=self.default).decode('utf-8')
+    
+    def loads(self, s, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+    
+    def response(self, *args: Any, **kwargs: Any):
+        # orjson already produces bytes; skip the str round-trip
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, default=self.default), mimetype=self.mimetype)
+
+
 # Initialize Flask app
 app = Flask(__name__)
+if orjson is not None:
+    app.json = OrjsonProvider(app)
+
+
+@functools.lru_cache(maxsize=8)
+def render_header(name: str, address: str, phone: str, email: str) -> bytes:
+    """ESC/POS bytes for the receipt header
+    
+    The header is the same on nearly every receipt, so it is rendered once per
+    restaurant profile and reused.
+    """
+    header = Dummy()
+    
+    # Restaurant name (centered, large text)
+    header.set(align='center', bold=True, double_width=True, double_height=True)
+    header.text(name + '\n')
+    
+    # Restaurant details (centered, normal text)
+    header.set(align='center', bold=False, normal_textsize=True)
+    header.text(address + '\n')
+    header.text(phone + '\n')
+    header.text(email + '\n')
+    header.text('\n')
+    
+    # Separator line
+    header._raw(DOUBLE_SEPARATOR_LINE)
+    header.text('\n')
+    return header.output
 
 
 class ReceiptPrinter:
@@ -59,33 +124,37 @@ class ReceiptPrinter:
     def __init__(self):
         self.printer = None
         self.printer_type = PRINTER_TYPE
+        # Flask serves each request on its own thread: one print (or reconnect) at a
+        # time, while /health and /status stay responsive during a print
+        self._lock = threading.RLock()
         
     def connect(self) -> bool:
         """Establish connection to printer"""
-        try:
-            logger.info(f"Connecting to {self.printer_type} printer...")
-            
-            if self.printer_type == "usb":
-                self.printer = Usb(USB_VENDOR_ID, USB_PRODUCT_ID)
-            elif self.printer_type == "network":
-                self.printer = Network(NETWORK_HOST, NETWORK_PORT)
-            elif self.printer_type == "serial":
-                self.printer = Serial(SERIAL_PORT, baudrate=SERIAL_BAUDRATE)
-            elif self.printer_type == "file":
-                self.printer = File(FILE_PATH)
-            else:
-                logger.error(f"Unknown printer type: {self.printer_type}")
-                return False
+        with self._lock:
+            try:
+                logger.info(f"Connecting to {self.printer_type} printer...")
                 
-            logger.info("Successfully connected to printer")
-            return True
-            
-        except USBNotFoundError:
-            logger.error(f"USB printer not found (VID: 0x{USB_VENDOR_ID:04x}, PID: 0x{USB_PRODUCT_ID:04x})")
-            return False
-        except Exception as e:
-            logger.error(f"Failed to connect to printer: {e}")
-            return False
+                if self.printer_type == "usb":
+                    self.printer = Usb(USB_VENDOR_ID, USB_PRODUCT_ID)
+                elif self.printer_type == "network":
+                    self.printer = Network(NETWORK_HOST, NETWORK_PORT)
+                elif self.printer_type == "serial":
+                    self.printer = Serial(SERIAL_PORT, baudrate=SERIAL_BAUDRATE)
+                elif self.printer_type == "file":
+                    self.printer = File(FILE_PATH)
+                else:
+                    logger.error(f"Unknown printer type: {self.printer_type}")
+                    return False
+                    
+                logger.info("Successfully connected to printer")
+                return True
+                
+            except USBNotFoundError:
+                logger.error(f"USB printer not found (VID: 0x{USB_VENDOR_ID:04x}, PID: 0x{USB_PRODUCT_ID:04x})")
+                return False
+            except Exception as e:
+                logger.error(f"Failed to connect to printer: {e}")
+                return False
     
     def disconnect(self):
         """Close printer connection"""
@@ -98,226 +167,258 @@ class ReceiptPrinter:
     
     def print_receipt(self, receipt_data: Dict[str, Any]) -> bool:
         """Print a receipt from structured data"""
-        try:
-            if not self.printer:
-                if not self.connect():
-                    return False
-            
-            logger.info(f"Printing receipt for order: {receipt_data.get('orderNumber')}")
-            
-            # Initialize printer
-            self.printer.hw('INIT')
-            
-            # Print header
-            self._print_header(receipt_data)
-            
-            # Print order details
-            self._print_order_details(receipt_data)
-            
-            # Print items
-            self._print_items(receipt_data.get('items', []))
-            
-            # Print totals
-            self._print_totals(receipt_data)
-            
-            # Print payment info
-            self._print_payment_info(receipt_data)
-            
-            # Print footer
-            self._print_footer(receipt_data)
-            
-            # Cut paper
-            self.printer.cut()
-            
-            logger.info(f"Receipt printed successfully for order: {receipt_data.get('orderNumber')}")
-            return True
-            
-        except ESCPOSError as e:
-            logger.error(f"ESC/POS error printing receipt: {e}")
-            return False
-        except Exception as e:
-            logger.error(f"Error printing receipt: {e}")
-            return False
+        with self._lock:
+            try:
+                if not self.printer:
+                    if not self.connect():
+                        return False
+                
+                logger.info(f"Printing receipt for order: {receipt_data.get('orderNumber')}")
+                
+                # Render the receipt in memory and send it in a single write, so
+                # the printer gets one continuous stream instead of dozens of small writes
+                receipt = Dummy()
+                
+                # Initialize printer
+                receipt._raw(PRINTER_INIT)
+                
+                # Print header
+                self._print_header(receipt, receipt_data)
+                
+                # Print order details
+                self._print_order_details(receipt, receipt_data)
+                
+                # Print items
+                self._print_items(receipt, receipt_data.get('items', []))
+                
+                # Print totals
+                self._print_totals(receipt, receipt_data)
+                
+                # Print payment info
+                self._print_payment_info(receipt, receipt_data)
+                
+                # Print footer
+                self._print_footer(receipt, receipt_data)
+                
+                # Cut paper
+                receipt._raw(RECEIPT_CUT)
+                
+                try:
+                    self.printer._raw(receipt.output)
+                except (ESCPOSError, serial.SerialException, OSError) as e:
+                    # A printer that was unplugged or power-cycled leaves a dead handle
+                    # behind; reconnect and resend the receipt once
+                    logger.warning(f"Printer write failed ({e}), reconnecting")
+                    self.disconnect()
+                    self.printer = None
+                    if not self.connect():
+                        return False
+                    self.printer._raw(receipt.output)
+                
+                logger.info(f"Receipt printed successfully for order: {receipt_data.get('orderNumber')}")
+                return True
+                
+            except ESCPOSError as e:
+                logger.error(f"ESC/POS error printing receipt: {e}")
+                return False
+            except Exception as e:
+                logger.error(f"Error printing receipt: {e}")
+                return False
     
-    def _print_header(self, data: Dict[str, Any]):
+    def _print_header(self, printer, data: Dict[str, Any]):
         """Print receipt header"""
-        # Restaurant name (centered, large text)
-        self.printer.set(align='center', text_type='B', width=2, height=2)
-        self.printer.text(data.get('restaurantName', 'Restaurant Name') + '\n')
-        
-        # Restaurant details (centered, normal text)
-        self.printer.set(align='center', text_type='normal')
-        self.printer.text(data.get('restaurantAddress', '') + '\n')
-        self.printer.text(data.get('restaurantPhone', '') + '\n')
-        self.printer.text(data.get('restaurantEmail', '') + '\n')
-        self.printer.text('\n')
-        
-        # Separator line
-        self.printer.text('=' * 32 + '\n')
-        self.printer.text('\n')
+        printer._raw(render_header(
+            data.get('restaurantName', 'Restaurant Name'),
+            data.get('restaurantAddress', ''),
+            data.get('restaurantPhone', ''),
+            data.get('restaurantEmail', '')
+        ))
     
-    def _print_order_details(self, data: Dict[str, Any]):
+    def _print_order_details(self, printer, data: Dict[str, Any]):
         """Print order information"""
-        self.printer.set(align='left', text_type='normal')
+        printer.set(align='left', bold=False)
         
         # Order number (bold)
-        self.printer.set(text_type='B')
-        self.printer.text(f"Order #: {data.get('orderNumber', 'N/A')}\n")
-        self.printer.set(text_type='normal')
+        printer.set(bold=True)
+        printer.text(f"Order #: {data.get('orderNumber', 'N/A')}\n")
+        printer.set(bold=False)
         
         # Date and time
         order_date = data.get('orderDate', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
-        self.printer.text(f"Date: {order_date}\n")
+        printer.text(f"Date: {order_date}\n")
         
         # Customer info (if provided)
         if data.get('customerName'):
-            self.printer.text(f"Customer: {data['customerName']}\n")
+            printer.text(f"Customer: {data['customerName']}\n")
         
-        self.printer.text('\n')
-        self.printer.text('-' * 32 + '\n')
-        self.printer.text('\n')
+        printer.text('\n')
+        printer._raw(SEPARATOR_LINE)
+        printer.text('\n')
     
-    def _print_items(self, items: list):
+    def _print_items(self, printer, items: list):
         """Print order items"""
-        self.printer.set(align='left', text_type='normal')
+        printer.set(align='left', bold=False)
         
         # Header
-        self.printer.text(f"{'Item':<20} {'Qty':>4} {'Amount':>7}\n")
-        self.printer.text('-' * 32 + '\n')
+        printer._raw(ITEMS_HEADER)
         
-        # Items
+        # Items, collected into one block of text between style changes
+        rows = []
         for item in items:
             name = item.get('productName', 'Unknown')
-            qty = item.get('quantity', 0)
-            price = item.get('lineTotal', 0.0)
             
             # Truncate long names
             if len(name) > 20:
                 name = name[:17] + '...'
             
-            self.printer.text(f"{name:<20} {qty:>4} {price:>7.2f}\n")
+            rows.append(ITEM_LINE_FMT.format(name, item.get('quantity', 0), item.get('lineTotal', 0.0)))
             
-            # Print notes if any
+            # Print notes if any (underlined, so the rows so far go out first)
             if item.get('notes'):
-                self.printer.set(text_type='U')
-                self.printer.text(f"  Note: {item['notes']}\n")
-                self.printer.set(text_type='normal')
+                printer.text(''.join(rows))
+                rows.clear()
+                printer.set(underline=1)
+                printer.text(f"  Note: {item['notes']}\n")
+                printer.set(underline=0)
         
-        self.printer.text('\n')
+        rows.append('\n')
+        printer.text(''.join(rows))
     
-    def _print_totals(self, data: Dict[str, Any]):
+    def _print_totals(self, printer, data: Dict[str, Any]):
         """Print totals section"""
-        self.printer.set(align='left', text_type='normal')
-        self.printer.text('-' * 32 + '\n')
+        printer.set(align='left', bold=False)
+        printer._raw(SEPARATOR_LINE)
         
         subtotal = data.get('subTotal', 0.0)
         tax = data.get('tax', 0.0)
         service_charge = data.get('serviceCharge', 0.0)
         total = data.get('totalAmount', 0.0)
         
-        self.printer.text(f"{'Subtotal:':<24} {subtotal:>7.2f}\n")
+        printer.text(f"{'Subtotal:':<24} {subtotal:>7.2f}\n")
         
         if tax > 0:
-            self.printer.text(f"{'VAT (12%):':<24} {tax:>7.2f}\n")
+            printer.text(f"{'VAT (12%):':<24} {tax:>7.2f}\n")
         
         if service_charge > 0:
-            self.printer.text(f"{'Service Charge:':<24} {service_charge:>7.2f}\n")
+            printer.text(f"{'Service Charge:':<24} {service_charge:>7.2f}\n")
         
-        self.printer.text('-' * 32 + '\n')
+        printer._raw(SEPARATOR_LINE)
         
         # Total (bold, larger)
-        self.printer.set(text_type='B', width=2, height=2)
-        self.printer.text(f"TOTAL: PHP {total:.2f}\n")
-        self.printer.set(text_type='normal', width=1, height=1)
+        printer.set(bold=True, double_width=True, double_height=True)
+        printer.text(f"TOTAL: PHP {total:.2f}\n")
+        printer.set(bold=False, normal_textsize=True)
         
-        self.printer.text('\n')
+        printer.text('\n')
     
-    def _print_payment_info(self, data: Dict[str, Any]):
+    def _print_payment_info(self, printer, data: Dict[str, Any]):
         """Print payment information"""
-        self.printer.set(align='left', text_type='normal')
+        printer.set(align='left', bold=False)
         
         payment_method = data.get('paymentMethod', 'N/A')
-        self.printer.text(f"Payment Method: {payment_method}\n")
+        printer.text(f"Payment Method: {payment_method}\n")
         
         # Cash payment details
         if payment_method.lower() == 'cash' and data.get('amountPaid'):
             amount_paid = data.get('amountPaid', 0.0)
             change = data.get('change', 0.0)
             
-            self.printer.text(f"Amount Paid: PHP {amount_paid:.2f}\n")
+            printer.text(f"Amount Paid: PHP {amount_paid:.2f}\n")
             if change > 0:
-                self.printer.set(text_type='B')
-                self.printer.text(f"Change: PHP {change:.2f}\n")
-                self.printer.set(text_type='normal')
+                printer.set(bold=True)
+                printer.text(f"Change: PHP {change:.2f}\n")
+                printer.set(bold=False)
         
-        self.printer.text('\n')
+        printer.text('\n')
     
-    def _print_footer(self, data: Dict[str, Any]):
+    def _print_footer(self, printer, data: Dict[str, Any]):
         """Print receipt footer"""
-        self.printer.set(align='center', text_type='normal')
-        
-        self.printer.text('=' * 32 + '\n')
-        self.printer.text('\n')
-        
-        # Thank you message
-        self.printer.set(text_type='B')
-        self.printer.text('Thank You!\n')
-        self.printer.set(text_type='normal')
-        self.printer.text('Please come again\n')
-        self.printer.text('\n')
+        printer._raw(render_footer())
         
         # Footer message
         if data.get('footerMessage'):
-            self.printer.text(data['footerMessage'] + '\n')
-            self.printer.text('\n')
+            printer.text(data['footerMessage'] + '\n')
+            printer.text('\n')
         
         # Status indicator
-        self.printer.text(f"Status: {data.get('status', 'PAID')}\n")
-        self.printer.text('\n')
+        printer.text(f"Status: {data.get('status', 'PAID')}\n")
+        printer.text('\n')
         
         # QR code (if provided)
         if data.get('qrData'):
             try:
-                self.printer.qr(data['qrData'], size=6)
-                self.printer.text('\n')
+                printer._raw(render_qr(data['qrData'], 6))
+                printer.text('\n')
             except Exception as e:
                 logger.warning(f"Could not print QR code: {e}")
         
-        self.printer.text('\n')
+        printer.text('\n')
     
     def test_print(self) -> bool:
         """Print a test receipt"""
-        try:
-            if not self.printer:
-                if not self.connect():
-                    return False
-            
-            logger.info("Printing test receipt...")
-            
-            self.printer.hw('INIT')
-            self.printer.set(align='center', text_type='B', width=2, height=2)
-            self.printer.text('TEST RECEIPT\n')
-            self.printer.set(align='center', text_type='normal', width=1, height=1)
-            self.printer.text('\n')
-            self.printer.text(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            self.printer.text('\n')
-            self.printer.text('Printer is working correctly!\n')
-            self.printer.text('\n')
-            self.printer.text('=' * 32 + '\n')
-            self.printer.text('\n')
-            self.printer.cut()
-            
-            logger.info("Test receipt printed successfully")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error printing test receipt: {e}")
-            return False
+        with self._lock:
+            try:
+                if not self.printer:
+                    if not self.connect():
+                        return False
+                
+                logger.info("Printing test receipt...")
+                
+                receipt = Dummy()
+                receipt._raw(PRINTER_INIT)
+                receipt.set(align='center', bold=True, double_width=True, double_height=True)
+                receipt.text('TEST RECEIPT\n')
+                receipt.set(align='center', bold=False, normal_textsize=True)
+                receipt.text('\n')
+                receipt.text(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+                receipt.text('\n')
+                receipt.text('Printer is working correctly!\n')
+                receipt.text('\n')
+                receipt._raw(DOUBLE_SEPARATOR_LINE)
+                receipt.text('\n')
+                receipt._raw(RECEIPT_CUT)
+                self.printer._raw(receipt.output)
+                
+                logger.info("Test receipt printed successfully")
+                return True
+                
+            except Exception as e:
+                logger.error(f"Error printing test receipt: {e}")
+                return False
 
 
 # Global printer instance
 printer = ReceiptPrinter()
 
+# Receipts waiting for the print worker, and the status of recent jobs (oldest first)
+job_queue: queue.Queue = queue.Queue(maxsize=PRINT_QUEUE_SIZE)
+job_status: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+job_status_lock = threading.Lock()
+
+
+def set_job_status(job_id: str, status: str, order_number: Optional[str] = None):
+    """Record a job's status, forgetting the oldest jobs beyond JOB_HISTORY_SIZE"""
+    with job_status_lock:
+        job = job_status.setdefault(job_id, {'jobId': job_id, 'orderNumber': order_number})
+        job['status'] = status
+        while len(job_status) > JOB_HISTORY_SIZE:
+            job_status.popitem(last=False)
+
+
+def print_worker():
+    """Print queued receipts one at a time, off the request threads"""
+    while True:
+        job_id, receipt_data = job_queue.get()
+        try:
+            set_job_status(job_id, 'printing')
+            success = printer.print_receipt(receipt_data)
+            set_job_status(job_id, 'completed' if success else 'failed')
+        except Exception as e:
+            logger.error(f"Error printing job {job_id}: {e}")
+            set_job_status(job_id, 'failed')
+        finally:
+            job_queue.task_done()
+
 
 # Flask API endpoints
 @app.route('/health', methods=['GET'])
@@ -332,7 +433,11 @@ def health_check():
 
 @app.route('/api/receipt/print', methods=['POST'])
 def print_receipt():
-    """Print a receipt from JSON data"""
+    """Queue a receipt from JSON data for printing
+    
+    Answers 202 as soon as the receipt is queued; printing at 9600 baud takes
+    seconds. Poll /api/receipt/job/<jobId> for the outcome.
+    """
     try:
         receipt_data = request.get_json()
         
@@ -342,21 +447,29 @@ def print_receipt():
                 'message': 'No receipt data provided'
             }), 400
         
-        logger.info(f"Received print request for order: {receipt_data.get('orderNumber')}")
-        
-        success = printer.print_receipt(receipt_data)
+        order_number = receipt_data.get('orderNumber')
+        logger.info(f"Received print request for order: {order_number}")
         
-        if success:
-            return jsonify({
-                'success': True,
-                'message': 'Receipt printed successfully',
-                'orderNumber': receipt_data.get('orderNumber')
-            })
-        else:
+        job_id = uuid.uuid4().hex
+        set_job_status(job_id, 'queued', order_number)
+        try:
+            job_queue.put_nowait((job_id, receipt_data))
+        except queue.Full:
+            with job_status_lock:
+                del job_status[job_id]
+            logger.error(f"Print queue full, rejecting order: {order_number}")
             return jsonify({
                 'success': False,
-                'message': 'Failed to print receipt'
-            }), 500
+                'message': 'Print queue is full'
+            }), 503
+        
+        return jsonify({
+            'success': True,
+            'message': 'Receipt queued for printing',
+            'jobId': job_id,
+            'status': 'queued',
+            'orderNumber': order_number
+        }), 202
             
     except Exception as e:
         logger.error(f"Error in print_receipt endpoint: {e}")
@@ -366,6 +479,22 @@ def print_receipt():
         }), 500
 
 
+@app.route('/api/receipt/job/<job_id>', methods=['GET'])
+def print_job_status(job_id: str):
+    """Get the status of a queued print job"""
+    with job_status_lock:
+        job = job_status.get(job_id)
+        job = dict(job) if job else None
+    
+    if not job:
+        return jsonify({
+            'success': False,
+            'message': 'Job not found'
+        }), 404
+    
+    return jsonify({'success': True, **job})
+
+
 @app.route('/api/receipt/test', methods=['POST'])
 def test_print_receipt():
     """Print a test receipt"""
@@ -431,9 +560,11 @@ def main():
     # Try to connect to printer on startup
     printer.connect()
     
+    threading.Thread(target=print_worker, name="PrintWorker", daemon=True).start()
+    
     # Start Flask server
     try:
-        app.run(host=FLASK_HOST, port=FLASK_PORT, debug=False)
+        app.run(host=FLASK_HOST, port=FLASK_PORT, debug=False, threaded=True)
     except Exception as e:
         logger.error(f"Fatal error: {e}")
     finally:
@@ -5,19 +5,46 @@ Runs on Raspberry Pi and polls the VPS for print jobs
 This solves the NAT/firewall issue since Pi initiates the connection
 """
 
+import functools
+import os
+import queue
+import random
 import requests
+import serial
+import signal
+import threading
 import time
 import json
 import logging
-from typing import Optional, Dict, Any
-from datetime import datetime
-from escpos.printer import Usb, Network, Serial, File
-from escpos.exceptions import USBNotFoundError, Error as ESCPOSError
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from escpos.printer import Usb, Network, Serial, File, Dummy
+from escpos.exceptions import Error as ESCPOSError
+from receipt_escpos import (ITEM_LINE_FMT, SEPARATOR_LINE, DOUBLE_SEPARATOR_LINE, ITEMS_HEADER,
+                            PRINTER_INIT, RECEIPT_CUT, render_footer, render_qr)
+
+# orjson is optional; stock Pi images fall back to the stdlib json module
+try:
+    import orjson
+    json_dumps = orjson.dumps
+    json_loads = orjson.loads
+except ImportError:
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+    json_loads = json.loads
 
 # Configuration
 # Printer Model: SHK24 (58mm thermal printer via USB-to-TTL)
 VPS_API_URL = "https://bochogs-kiosk.store"  # Your VPS URL
-POLL_INTERVAL = 2  # seconds between checking for new print jobs
+POLL_INTERVAL = 2  # minimum seconds between checks for new print jobs (and first retry delay on errors)
+BACKOFF_MAX = 30  # longest retry delay, in seconds, while the VPS keeps failing
+BACKOFF_RATE = 1.5  # growth factor of the retry delay after each failed poll
+LONG_POLL_SECONDS = 25  # seconds the VPS may hold an empty poll open waiting for a job
+MAX_BATCH_JOBS = 4  # print jobs fetched, printed and acknowledged together when several are queued
+PRINTED_JOB_HISTORY = 256  # recently printed job IDs kept so a job handed out again is not printed twice
 PRINTER_TYPE = "serial"  # Using USB-to-TTL adapter
 
 # USB Configuration (for direct USB printers)
@@ -29,18 +56,73 @@ USB_PRODUCT_ID = 0x0e15
 SERIAL_PORT = "/dev/ttyUSB0"  # Change based on your system
 SERIAL_BAUDRATE = 9600  # SHK24 default: 9600
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('receipt_printer_client.log'),
-        logging.StreamHandler()
-    ]
+# Process scheduling (best effort; needs CAP_SYS_NICE or root to raise priority)
+PROCESS_NICE = None  # nice value for the client (e.g. -5), or None to leave it unchanged
+CPU_AFFINITY = None  # CPU cores to pin the client to, e.g. {3} on a Pi 4, or None for any core
+
+# Setup logging with rotation; handlers run on a QueueListener thread, so logging
+# in the poll loop only enqueues the record instead of blocking on SD card writes
+log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+file_handler = RotatingFileHandler(
+    'receipt_printer_client.log',
+    maxBytes=10*1024*1024,  # 10MB
+    backupCount=5,
+    encoding='utf-8'
 )
+file_handler.setFormatter(log_formatter)
+console_handler = logging.StreamHandler()
+console_handler.setFormatter(log_formatter)
+
+log_queue: queue.Queue = queue.Queue(-1)
+log_listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+log_listener.start()
+
+# python-escpos calls logging.basicConfig() on import; replace its stderr handler
+root_logger = logging.getLogger()
+for handler in root_logger.handlers[:]:
+    root_logger.removeHandler(handler)
+root_logger.setLevel(logging.INFO)
+root_logger.addHandler(QueueHandler(log_queue))
 logger = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=8)
+def render_header(name: str, address: str, phone: str) -> bytes:
+    """ESC/POS bytes for the receipt header
+    
+    The header is the same on nearly every receipt, so it is rendered once per
+    restaurant layout and reused.
+    """
+    header = Dummy()
+    header.set(align='center', bold=True, double_width=True, double_height=True)
+    header.text(name + '\n')
+    header.set(align='center', bold=False, normal_textsize=True)
+    header.text(address + '\n')
+    header.text(phone + '\n')
+    header.text('\n')
+    header._raw(DOUBLE_SEPARATOR_LINE)
+    header.text('\n')
+    return header.output
+
+
+@functools.lru_cache(maxsize=None)
+def render_style(**style: Any) -> bytes:
+    """ESC/POS bytes for a printer.set() call, rendered once per style"""
+    styled = Dummy()
+    styled.set(**style)
+    return styled.output
+
+
+def write_text(printer, text: str):
+    """Write receipt text, skipping escpos's codepage lookup when it is plain ASCII"""
+    if text.isascii():
+        # Plain ASCII prints the same in every codepage; skip the encoder
+        printer._raw(text.encode('ascii'))
+    else:
+        # Let escpos pick a codepage for accented text (e.g. "Ñ")
+        printer.text(text)
+
+
 class ReceiptPrinterClient:
     """Client that polls VPS for print jobs and prints them"""
     
@@ -50,6 +132,46 @@ class ReceiptPrinterClient:
         self.printer_type = PRINTER_TYPE
         self.session = requests.Session()
         
+        # Keep the job-status connection alive between requests and let urllib3
+        # retry connection errors and 502/503/504 with backoff (marking a job
+        # completed or failed twice is harmless)
+        retry = Retry(
+            total=5,
+            connect=5,
+            read=2,
+            backoff_factor=0.5,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(['GET', 'POST']),
+            raise_on_status=False
+        )
+        # A request that finds the connection busy waits for it instead of
+        # opening a throwaway TLS connection
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1, pool_block=True, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
+        # The job poll dequeues on the VPS: after a read timeout or a gateway 502/504
+        # the jobs may already have been taken, and a silent retry would lose them.
+        # Only connect errors (the request never left) are retried; run() backs off
+        # and polls again otherwise. requests picks the longest matching mount.
+        poll_retry = Retry(
+            total=5,
+            connect=5,
+            read=0,
+            status=0,
+            backoff_factor=0.5,
+            allowed_methods=frozenset(['GET']),
+            raise_on_status=False
+        )
+        poll_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1, pool_block=True, max_retries=poll_retry)
+        self.session.mount(f"{vps_url}/api/receipt/queue/next", poll_adapter)
+        # Request bodies are pre-encoded with json_dumps and sent as data=
+        self.session.headers['Content-Type'] = 'application/json'
+        self._results: queue.Queue = queue.Queue()  # (job_ids, error) for failed jobs waiting to be reported
+        self._pending_acks: List[str] = []  # Printed job IDs to acknowledge on the next poll
+        self._printed: "OrderedDict[str, None]" = OrderedDict()  # Recently printed job IDs, oldest first
+        self._stop_event = threading.Event()  # Ends run() and cuts short its waits on shutdown
+        
     def connect_printer(self) -> bool:
         """Establish connection to printer"""
         try:
@@ -61,6 +183,12 @@ class ReceiptPrinterClient:
                 self.printer = Network(NETWORK_HOST, NETWORK_PORT)
             elif self.printer_type == "serial":
                 self.printer = Serial(SERIAL_PORT, baudrate=SERIAL_BAUDRATE)
+                # escpos opens the port lazily on the first write; open it now so a missing
+                # printer shows up here. pyserial configures the tty raw with blocking
+                # writes, so a whole receipt goes to the kernel's TX buffer in one call.
+                self.printer.open()
+                # Drop bytes a previous connection left queued (tcflush TCOFLUSH)
+                self.printer.device.reset_output_buffer()
             elif self.printer_type == "file":
                 self.printer = File("/tmp/receipt.txt")
             
@@ -69,23 +197,44 @@ class ReceiptPrinterClient:
             
         except Exception as e:
             logger.error(f"Failed to connect to printer: {e}")
+            self.printer = None  # Retry on the next receipt
             return False
     
-    def check_for_print_jobs(self) -> Optional[Dict[str, Any]]:
-        """Poll VPS for pending print jobs"""
+    def check_for_print_jobs(self) -> Optional[List[Dict[str, Any]]]:
+        """Poll VPS for pending print jobs
+        
+        Long-polls: with an empty queue the VPS holds the request for up to
+        LONG_POLL_SECONDS and answers as soon as a job is queued. Up to
+        MAX_BATCH_JOBS jobs that are already queued come back together.
+        
+        Jobs printed since the last poll are acknowledged in the same request.
+        
+        Returns None when the VPS could not be reached or gave an unexpected answer.
+        """
         try:
             url = f"{self.vps_url}/api/receipt/queue/next"
-            response = self.session.get(url, timeout=5)
+            params = {"wait": LONG_POLL_SECONDS, "max": MAX_BATCH_JOBS}
+            if self._pending_acks:
+                params["ack"] = ",".join(self._pending_acks)
+            response = self.session.get(url, params=params, timeout=5 + LONG_POLL_SECONDS)
+            
+            if response.status_code in (200, 204):
+                # The VPS marks acknowledged jobs completed before answering; any other
+                # status (e.g. a proxy 502) may not have reached it, so the acks are resent
+                self._pending_acks.clear()
             
             if response.status_code == 200:
-                data = response.json()
+                data = json_loads(response.content)
                 if data.get('hasPrintJob'):
-                    return data.get('receiptData')
+                    # A VPS without batching returns the single job in the top-level fields
+                    return data.get('jobs') or [data]
             elif response.status_code == 204:
                 # No print jobs pending
-                return None
+                return []
             else:
                 logger.warning(f"Unexpected status code: {response.status_code}")
+                return None
+            return []
                 
         except requests.exceptions.RequestException as e:
             logger.error(f"Error checking for print jobs: {e}")
@@ -94,108 +243,134 @@ class ReceiptPrinterClient:
     
     def print_receipt(self, receipt_data: Dict[str, Any]) -> bool:
         """Print a receipt"""
-        try:
-            if not self.printer:
-                if not self.connect_printer():
-                    return False
-            
-            order_number = receipt_data.get('orderNumber', 'N/A')
-            logger.info(f"Printing receipt for order: {order_number}")
-            
-            # Initialize printer
-            self.printer.hw('INIT')
-            
-            # Print header
-            self._print_header(receipt_data)
-            self._print_order_details(receipt_data)
-            self._print_items(receipt_data.get('items', []))
-            self._print_totals(receipt_data)
-            self._print_payment_info(receipt_data)
-            self._print_footer(receipt_data)
-            
-            # Cut paper
-            self.printer.cut()
-            
-            logger.info(f"Receipt printed successfully for order: {order_number}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error printing receipt: {e}")
-            return False
+        return self.print_receipts([receipt_data]) == 1
+    
+    def print_receipts(self, receipts: List[Dict[str, Any]]) -> int:
+        """Print one or more receipts in order, stopping at the first that fails
+        
+        The printer is initialized once and every receipt still gets its own
+        cut, since each one goes to a different customer. Each receipt is sent
+        in its own write, so a failed write is resent for that receipt alone.
+        
+        Returns how many receipts were printed.
+        """
+        if not self.printer:
+            if not self.connect_printer():
+                return 0
+        
+        init = PRINTER_INIT
+        for printed, receipt_data in enumerate(receipts):
+            try:
+                order_number = receipt_data.get('orderNumber', 'N/A')
+                logger.info(f"Printing receipt for order: {order_number}")
+                
+                # Render the receipt in memory and send it in a single write, so
+                # the printer gets one continuous stream instead of dozens of small writes
+                receipt = Dummy()
+                self._print_header(receipt, receipt_data)
+                self._print_order_details(receipt, receipt_data)
+                self._print_items(receipt, receipt_data.get('items', []))
+                self._print_totals(receipt, receipt_data)
+                self._print_payment_info(receipt, receipt_data)
+                self._print_footer(receipt, receipt_data)
+                
+                # Cut paper
+                receipt._raw(RECEIPT_CUT)
+                
+                try:
+                    self.printer._raw(init + receipt.output)
+                except (ESCPOSError, serial.SerialException, OSError) as e:
+                    # A printer that was unplugged or power-cycled leaves a dead handle
+                    # behind; reconnect and resend this receipt once
+                    logger.warning(f"Printer write failed ({e}), reconnecting")
+                    try:
+                        self.printer.close()
+                    except Exception:
+                        pass
+                    self.printer = None
+                    if not self.connect_printer():
+                        return printed
+                    self.printer._raw(PRINTER_INIT + receipt.output)
+                init = b''
+                
+                logger.info(f"Receipt printed successfully for order: {order_number}")
+                
+            except Exception as e:
+                logger.error(f"Error printing receipt: {e}")
+                return printed
+        
+        return len(receipts)
     
-    def _print_header(self, data: Dict[str, Any]):
+    def _print_header(self, printer, data: Dict[str, Any]):
         """Print receipt header"""
-        self.printer.set(align='center', text_type='B', width=2, height=2)
-        self.printer.text(data.get('restaurantName', 'Restaurant') + '\n')
-        self.printer.set(align='center', text_type='normal')
-        self.printer.text(data.get('restaurantAddress', '') + '\n')
-        self.printer.text(data.get('restaurantPhone', '') + '\n')
-        self.printer.text('\n')
-        self.printer.text('=' * 32 + '\n\n')
+        printer._raw(render_header(
+            data.get('restaurantName', 'Restaurant'),
+            data.get('restaurantAddress', ''),
+            data.get('restaurantPhone', '')
+        ))
     
-    def _print_order_details(self, data: Dict[str, Any]):
+    def _print_order_details(self, printer, data: Dict[str, Any]):
         """Print order information"""
-        self.printer.set(align='left', text_type='B')
-        self.printer.text(f"Order #: {data.get('orderNumber', 'N/A')}\n")
-        self.printer.set(text_type='normal')
-        self.printer.text(f"Date: {data.get('orderDate', '')}\n")
+        printer._raw(render_style(align='left', bold=True))
+        write_text(printer, f"Order #: {data.get('orderNumber', 'N/A')}\n")
+        printer._raw(render_style(bold=False))
+        details = f"Date: {data.get('orderDate', '')}\n"
         if data.get('customerName'):
-            self.printer.text(f"Customer: {data['customerName']}\n")
-        self.printer.text('\n' + '-' * 32 + '\n\n')
+            details += f"Customer: {data['customerName']}\n"
+        write_text(printer, details)
+        printer._raw(b'\n' + SEPARATOR_LINE + b'\n')
     
-    def _print_items(self, items: list):
+    def _print_items(self, printer, items: list):
         """Print order items"""
-        self.printer.text(f"{'Item':<20} {'Qty':>4} {'Amount':>7}\n")
-        self.printer.text('-' * 32 + '\n')
-        
-        for item in items:
-            name = item.get('productName', 'Unknown')[:20]
-            qty = item.get('quantity', 0)
-            price = item.get('lineTotal', 0.0)
-            self.printer.text(f"{name:<20} {qty:>4} {price:>7.2f}\n")
+        printer._raw(ITEMS_HEADER)
         
-        self.printer.text('\n')
+        format_item = ITEM_LINE_FMT.format
+        rows = ''.join(
+            format_item(item.get('productName', 'Unknown')[:20], item.get('quantity', 0), item.get('lineTotal', 0.0))
+            for item in items
+        ) + '\n'
+        write_text(printer, rows)
     
-    def _print_totals(self, data: Dict[str, Any]):
-        """Print totals"""
-        self.printer.text('-' * 32 + '\n')
-        self.printer.text(f"{'Subtotal:':<24} {data.get('subTotal', 0):>7.2f}\n")
+    def _print_totals(self, printer, data: Dict[str, Any]):
+        """Print totals
+        
+        The layout is fixed and only the amounts change, so the block is built
+        as ASCII bytes around cached style escapes and written in one go.
+        """
+        block = [SEPARATOR_LINE, f"{'Subtotal:':<24} {data.get('subTotal', 0):>7.2f}\n".encode('ascii')]
         
         if data.get('tax', 0) > 0:
-            self.printer.text(f"{'VAT (12%):':<24} {data['tax']:>7.2f}\n")
+            block.append(f"{'VAT (12%):':<24} {data['tax']:>7.2f}\n".encode('ascii'))
         
-        self.printer.text('-' * 32 + '\n')
-        self.printer.set(text_type='B', width=2, height=2)
-        self.printer.text(f"TOTAL: PHP {data.get('totalAmount', 0):.2f}\n")
-        self.printer.set(text_type='normal', width=1, height=1)
-        self.printer.text('\n')
+        block += [
+            SEPARATOR_LINE,
+            render_style(bold=True, double_width=True, double_height=True),
+            f"TOTAL: PHP {data.get('totalAmount', 0):.2f}\n".encode('ascii'),
+            render_style(bold=False, normal_textsize=True),
+            b'\n',
+        ]
+        printer._raw(b''.join(block))
     
-    def _print_payment_info(self, data: Dict[str, Any]):
+    def _print_payment_info(self, printer, data: Dict[str, Any]):
         """Print payment information"""
-        self.printer.text(f"Payment: {data.get('paymentMethod', 'N/A')}\n")
+        write_text(printer, f"Payment: {data.get('paymentMethod', 'N/A')}\n")
         
         if data.get('amountPaid'):
-            self.printer.text(f"Paid: PHP {data['amountPaid']:.2f}\n")
+            printer._raw(f"Paid: PHP {data['amountPaid']:.2f}\n".encode('ascii'))
             if data.get('change', 0) > 0:
-                self.printer.set(text_type='B')
-                self.printer.text(f"Change: PHP {data['change']:.2f}\n")
-                self.printer.set(text_type='normal')
+                printer._raw(render_style(bold=True))
+                printer._raw(f"Change: PHP {data['change']:.2f}\n".encode('ascii'))
+                printer._raw(render_style(bold=False))
         
-        self.printer.text('\n')
+        printer._raw(b'\n')
     
-    def _print_footer(self, data: Dict[str, Any]):
+    def _print_footer(self, printer, data: Dict[str, Any]):
         """Print receipt footer"""
-        self.printer.set(align='center')
-        self.printer.text('=' * 32 + '\n')
-        self.printer.set(text_type='B')
-        self.printer.text('Thank You!\n')
-        self.printer.set(text_type='normal')
-        self.printer.text('Please come again\n\n')
+        printer._raw(render_footer())
         
         if data.get('qrData'):
             try:
-                self.printer.qr(data['qrData'], size=6)
-                self.printer.text('\n')
+                printer._raw(render_qr(data['qrData'], 6) + b'\n')
             except:
                 pass
     
@@ -213,55 +388,144 @@ class ReceiptPrinterClient:
         """Notify VPS that print job failed"""
         try:
             url = f"{self.vps_url}/api/receipt/queue/failed/{job_id}"
-            response = self.session.post(url, json={"error": error}, timeout=5)
+            response = self.session.post(url, data=json_dumps({"error": error}), timeout=5)
             return response.status_code == 200
         except Exception as e:
             logger.error(f"Error marking job failed: {e}")
             return False
     
+    def _notify_loop(self):
+        """Report failed jobs to the VPS on a separate thread
+        
+        The failure POST overlaps the next poll and print instead of holding
+        them up for a round-trip. A None item ends the loop.
+        """
+        while True:
+            result = self._results.get()
+            if result is None:
+                break
+            job_ids, error = result
+            for job_id in job_ids:
+                self.mark_job_failed(job_id, error)
+    
+    def stop(self):
+        """Ask run() to exit, waking it from its waits
+        
+        A request already in flight (a long-poll, or its retries) still runs to
+        completion before run() returns.
+        """
+        self._stop_event.set()
+    
     def run(self):
         """Main loop - poll for print jobs"""
         logger.info("=" * 60)
-        logger.info("Receipt Printer Client - Polling Mode")
+        logger.info("Receipt Printer Client - Long-Polling Mode")
         logger.info(f"VPS URL: {self.vps_url}")
         logger.info(f"Poll Interval: {POLL_INTERVAL}s")
+        logger.info(f"Long-Poll Wait: {LONG_POLL_SECONDS}s")
         logger.info("=" * 60)
         
         # Connect to printer on startup
         self.connect_printer()
         
-        while True:
+        notifier = threading.Thread(target=self._notify_loop, name="PrintJobNotifier", daemon=True)
+        notifier.start()
+        
+        self._stop_event.clear()
+        backoff = POLL_INTERVAL
+        unprinted = []  # Jobs left in a batch after a receipt that failed to print
+        while not self._stop_event.is_set():
             try:
-                # Check for print jobs
-                job_data = self.check_for_print_jobs()
+                if unprinted:
+                    jobs, unprinted = unprinted, []
+                else:
+                    # Check for print jobs
+                    started = time.monotonic()
+                    jobs = self.check_for_print_jobs()
+                    
+                    if jobs is None:
+                        # VPS unreachable or failing: back off with jitter so a fleet of
+                        # kiosks does not retry in lockstep when it comes back
+                        self._stop_event.wait(random.uniform(POLL_INTERVAL, backoff))
+                        backoff = min(BACKOFF_MAX, backoff * BACKOFF_RATE)
+                        continue
+                    backoff = POLL_INTERVAL
                 
-                if job_data:
-                    job_id = job_data.get('jobId')
-                    receipt_data = job_data.get('receipt')
+                if jobs:
+                    # Jobs printed before whose acknowledgement never reached the VPS
+                    # are acknowledged again instead of printing a second receipt
+                    replayed = [job.get('jobId') for job in jobs if job.get('jobId') in self._printed]
+                    if replayed:
+                        logger.warning(f"Already printed, acknowledging again: {', '.join(map(str, replayed))}")
+                        self._pending_acks.extend(replayed)
+                        jobs = [job for job in jobs if job.get('jobId') not in self._printed]
+                        if not jobs:
+                            continue
+                    
+                    job_ids = [job.get('jobId') for job in jobs]
                     
-                    logger.info(f"Received print job: {job_id}")
+                    logger.info(f"Received print job: {', '.join(map(str, job_ids))}")
                     
-                    # Print receipt
-                    success = self.print_receipt(receipt_data)
+                    # Print receipts
+                    printed = self.print_receipts([job.get('receipt') for job in jobs])
                     
-                    # Notify VPS
-                    if success:
-                        self.mark_job_completed(job_id)
-                    else:
-                        self.mark_job_failed(job_id, "Printing failed")
+                    # Notify VPS: completions ride on the next poll, failures go in the background
+                    self._pending_acks.extend(job_ids[:printed])
+                    for job_id in job_ids[:printed]:
+                        self._printed[job_id] = None
+                    while len(self._printed) > PRINTED_JOB_HISTORY:
+                        self._printed.popitem(last=False)
+                    
+                    if printed < len(jobs):
+                        # Only the receipt that failed is reported; the rest of the
+                        # batch is printed next, before polling again
+                        self._results.put(([job_ids[printed]], "Printing failed"))
+                        unprinted = jobs[printed + 1:]
+                    continue  # More jobs may be queued; ask again at once
                 
-                time.sleep(POLL_INTERVAL)
+                # An empty long-poll already waited on the VPS; only an early answer
+                # from a VPS without long-polling sleeps out the interval
+                self._stop_event.wait(max(0.0, POLL_INTERVAL - (time.monotonic() - started)))
                 
             except KeyboardInterrupt:
                 logger.info("Shutting down...")
                 break
             except Exception as e:
                 logger.error(f"Error in main loop: {e}")
-                time.sleep(POLL_INTERVAL)
+                self._stop_event.wait(random.uniform(POLL_INTERVAL, backoff))
+                backoff = min(BACKOFF_MAX, backoff * BACKOFF_RATE)
+        
+        # Let results still in flight reach the VPS before exiting
+        for job_id in self._pending_acks:
+            self.mark_job_completed(job_id)
+        if unprinted:
+            self._results.put(([job.get('jobId') for job in unprinted], "Client stopped before printing"))
+        self._results.put(None)
+        notifier.join(timeout=10)
+
+
+def apply_process_priority():
+    """Raise the client's scheduling priority and pin it to CPU_AFFINITY, if allowed"""
+    if PROCESS_NICE is not None:
+        try:
+            os.nice(PROCESS_NICE - os.nice(0))
+            logger.info(f"Process nice value set to {PROCESS_NICE}")
+        except OSError as e:
+            logger.warning(f"Could not set nice value {PROCESS_NICE}: {e}")
+    
+    if CPU_AFFINITY is not None and hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, CPU_AFFINITY)
+            logger.info(f"Process pinned to CPU cores: {sorted(CPU_AFFINITY)}")
+        except OSError as e:
+            logger.warning(f"Could not pin process to CPU cores {sorted(CPU_AFFINITY)}: {e}")
 
 
 def main():
+    apply_process_priority()
     client = ReceiptPrinterClient(VPS_API_URL)
+    # systemd stops the service with SIGTERM; finish the current job and exit cleanly
+    signal.signal(signal.SIGTERM, lambda signum, frame: client.stop())
     
     try:
         client.run()
@@ -269,6 +533,7 @@ def main():
         logger.error(f"Fatal error: {e}")
     finally:
         logger.info("Receipt printer client stopped")
+        log_listener.stop()  # Flushes queued records before exit
 
 
 if __name__ == "__main__":